@@ -21,6 +21,18 @@ from .azure_video_node import (
     NODE_CLASS_MAPPINGS as AZURE_VIDEO_CLASSES,
     NODE_DISPLAY_NAME_MAPPINGS as AZURE_VIDEO_NAMES,
 )
+from .upload_queue_status_node import (
+    NODE_CLASS_MAPPINGS as UPLOAD_QUEUE_CLASSES,
+    NODE_DISPLAY_NAME_MAPPINGS as UPLOAD_QUEUE_NAMES,
+)
+from .multi_upload_image_node import (
+    NODE_CLASS_MAPPINGS as MULTI_UPLOAD_CLASSES,
+    NODE_DISPLAY_NAME_MAPPINGS as MULTI_UPLOAD_NAMES,
+)
+from .output_sync_node import (
+    NODE_CLASS_MAPPINGS as OUTPUT_SYNC_CLASSES,
+    NODE_DISPLAY_NAME_MAPPINGS as OUTPUT_SYNC_NAMES,
+)
 
 # --- Latent Nodes ---
 from .latent_save_output_node import (
@@ -31,6 +43,14 @@ from .latent_load_node import (
     NODE_CLASS_MAPPINGS as LATENT_LOAD_CLASSES,
     NODE_DISPLAY_NAME_MAPPINGS as LATENT_LOAD_NAMES,
 )
+from .latent_batch_load_node import (
+    NODE_CLASS_MAPPINGS as LATENT_BATCH_LOAD_CLASSES,
+    NODE_DISPLAY_NAME_MAPPINGS as LATENT_BATCH_LOAD_NAMES,
+)
+from .latent_status_node import (
+    NODE_CLASS_MAPPINGS as LATENT_STATUS_CLASSES,
+    NODE_DISPLAY_NAME_MAPPINGS as LATENT_STATUS_NAMES,
+)
 
 # --- Conditioning JSON Nodes ---
 from .conditioning_load_json_node import (
@@ -55,8 +75,13 @@ NODE_GROUPS = [
     (S3_VIDEO_CLASSES, S3_VIDEO_NAMES),
     (AZURE_IMAGE_CLASSES, AZURE_IMAGE_NAMES),
     (AZURE_VIDEO_CLASSES, AZURE_VIDEO_NAMES),
+    (UPLOAD_QUEUE_CLASSES, UPLOAD_QUEUE_NAMES),
+    (MULTI_UPLOAD_CLASSES, MULTI_UPLOAD_NAMES),
+    (OUTPUT_SYNC_CLASSES, OUTPUT_SYNC_NAMES),
     (LATENT_SAVE_CLASSES, LATENT_SAVE_NAMES),
     (LATENT_LOAD_CLASSES, LATENT_LOAD_NAMES),
+    (LATENT_BATCH_LOAD_CLASSES, LATENT_BATCH_LOAD_NAMES),
+    (LATENT_STATUS_CLASSES, LATENT_STATUS_NAMES),
     (COND_LOAD_CLASSES, COND_LOAD_NAMES),
     (COND_SAVE_CLASSES, COND_SAVE_NAMES),
 ]
@@ -1,32 +1,41 @@
 # azure_image_node.py
-import io, os, time
-import requests
-from datetime import datetime, timedelta
-
-from azure.storage.blob import (
-    BlobServiceClient,
-    ContentSettings,
-    BlobSasPermissions,
-    generate_blob_sas,
-)
-
-# optional: if python-dotenv is installed, we'll load .env automatically (won't error if missing)
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except Exception:
-    pass
+from .callbacks import CALLBACK_MODES, DEFAULT_MODE as DEFAULT_CALLBACK_MODE
+from .image_archive import ARCHIVE_MODES
+from .image_encoding import IMAGE_FORMATS
+from .upload_backends import AzureBackend, local_override
+from .upload_metrics import ENABLED as METRICS_ENABLED, start_metrics
+from .upload_pipeline import upload_image_archive, upload_image_batch
 
 
 class AzureImageNode:
     """
-    Upload an IMAGE tensor (PNG) to Azure Blob, return (image, url), and optionally POST a callback.
+    Upload an IMAGE tensor (PNG, JPEG or WebP) to Azure Blob, return (image, url), and optionally POST a callback.
 
     Priority for credentials:
       1) connection_string (node field)
       2) env AZURE_STORAGE_CONNECTION_STRING
       3) account_name + account_key (node fields)
       4) env AZURE_STORAGE_ACCOUNT + AZURE_STORAGE_KEY
+
+    With `batch_mode` every frame of the batch is encoded and uploaded (on up to
+    `max_workers` threads); `blob_name_template` supports {timestamp}, {index} and {sha256}.
+    `url` is the newline-joined list of URLs, `urls` the list itself.
+
+    With `async_upload` the encoded images are spooled to disk and uploaded (plus
+    callback) by the background queue; the node returns the URLs immediately.
+
+    With `dedup` the encoded bytes are hashed ({sha256} is available in the blob
+    name) and uploads of bytes already present at the blob are skipped;
+    `dedup_verify_remote` confirms that with a HEAD request.
+
+    With `collect_metrics` the `metrics` output is a JSON report of per-stage
+    timings and byte counts (encode, sign, upload, callback, ...).
+
+    With `archive_format` tar / zip the frames are encoded in parallel and streamed,
+    in batch order, into a single archive uploaded part by part while it is written
+    (`blob_name_template` names the archive, `archive_member_template` the frames, with
+    {index} zero-padded). One callback describes the archive; async_upload and dedup
+    do not apply.
     """
 
     @classmethod
@@ -44,37 +53,33 @@ class AzureImageNode:
                 "use_signed_url": ("BOOLEAN", {"default": False}),
                 "signed_expires": ("INT", {"default": 3600, "min": 60, "max": 604800}),
                 "callback_url": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                "batch_mode": ("BOOLEAN", {"default": True}),
+                "max_workers": ("INT", {"default": 4, "min": 1, "max": 32}),
+                # Encoder: png (compress_level 0-9), jpeg / webp (quality), webp_lossless
+                "image_format": (list(IMAGE_FORMATS), {"default": "png"}),
+                "quality": ("INT", {"default": 90, "min": 1, "max": 100}),
+                "compress_level": ("INT", {"default": 6, "min": 0, "max": 9}),
+                "async_upload": ("BOOLEAN", {"default": False}),
+                "dedup": ("BOOLEAN", {"default": False}),
+                "dedup_verify_remote": ("BOOLEAN", {"default": False}),
+                # sync | async (fire-and-forget) | async_batched (coalesced {"events": [...]} POSTs)
+                "callback_mode": (CALLBACK_MODES, {"default": DEFAULT_CALLBACK_MODE}),
+                # Per-stage timings/bytes on the `metrics` output (+ Prometheus file, see upload_metrics.py)
+                "collect_metrics": ("BOOLEAN", {"default": METRICS_ENABLED}),
+                # tar / zip: stream all frames into one archive object instead of one object per frame
+                "archive_format": (ARCHIVE_MODES, {"default": "none"}),
+                "archive_member_template": ("STRING", {"default": "frame_{index}.png"}),
             }
         }
 
-    RETURN_TYPES = ("IMAGE", "STRING")
-    RETURN_NAMES = ("image", "url")
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("image", "url", "urls", "metrics")
+    OUTPUT_IS_LIST = (False, False, True, False)
     FUNCTION = "upload"
     CATEGORY = "JLNodes/cloud"
 
-    # ---- helpers ----
-    def _get_service_client(self, connection_string, account_name, account_key):
-        cs = (connection_string or "").strip() or os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
-        if cs:
-            return BlobServiceClient.from_connection_string(cs), None, None
-
-        acct = (account_name or "").strip() or os.getenv("AZURE_STORAGE_ACCOUNT", "").strip()
-        key  = (account_key  or "").strip() or os.getenv("AZURE_STORAGE_KEY", "").strip()
-        if not acct or not key:
-            raise ValueError("Azure credentials missing: set connection_string OR account_name+account_key (or env).")
-        bsc = BlobServiceClient(account_url=f"https://{acct}.blob.core.windows.net", credential=key)
-        return bsc, acct, key
-
-    def _tensor_to_png_bytes(self, image):
-        from PIL import Image
-        import numpy as np
-        arr = image[0].cpu().numpy()
-        arr = (np.clip(arr, 0, 1) * 255).astype("uint8")
-        pil = Image.fromarray(arr)
-        buf = io.BytesIO()
-        pil.save(buf, format="PNG")
-        return buf.getvalue()
-
     # ---- main ----
     def upload(
         self,
@@ -88,63 +93,43 @@ class AzureImageNode:
         use_signed_url,
         signed_expires,
         callback_url,
+        batch_mode=True,
+        max_workers=4,
+        image_format="png",
+        quality=90,
+        compress_level=6,
+        async_upload=False,
+        dedup=False,
+        dedup_verify_remote=False,
+        callback_mode=DEFAULT_CALLBACK_MODE,
+        collect_metrics=METRICS_ENABLED,
+        archive_format="none",
+        archive_member_template="frame_{index}.png",
     ):
-        # 1) prepare bytes
-        data = self._tensor_to_png_bytes(image)
-        timestamp = str(int(time.time()))
-        blob_name = blob_name_template.replace("{timestamp}", timestamp)
-
-        # 2) client/container
-        bsc, acct, key = self._get_service_client(connection_string, account_name, account_key)
-        container_client = bsc.get_container_client(container_name.strip() or "images")
-        try:
-            container_client.create_container()
-        except Exception:
-            pass  # already exists
-
-        # 3) upload
-        container_client.upload_blob(
-            name=blob_name,
-            data=data,
-            overwrite=True,
-            content_settings=ContentSettings(content_type=mime),
-        )
-
-        # 4) build URL (public if container access level = Blob)
-        url = f"{container_client.url}/{blob_name}"
-        path = blob_name
-
-        # 5) optional SAS
-        if use_signed_url:
-            if acct is None:
-                acct = bsc.account_name
-            if not key:
-                key = os.getenv("AZURE_STORAGE_KEY", "")
-            if not key:
-                raise ValueError("AZURE_STORAGE_KEY required to generate SAS when use_signed_url=True.")
-            sas = generate_blob_sas(
-                account_name=acct,
-                container_name=container_name,
-                blob_name=blob_name,
-                account_key=key,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(seconds=int(signed_expires)),
+        # Encoding, keys, dedup, queueing and callbacks live in upload_pipeline.py
+        container = container_name.strip() or "images"
+        metrics = start_metrics("AzureImageNode", collect_metrics)
+        backend = local_override(container) or AzureBackend(container, connection_string, account_name, account_key)
+        if archive_format != "none":
+            url = upload_image_archive(
+                backend, image, blob_name_template, archive_member_template, archive_format,
+                use_signed_url=use_signed_url, signed_expires=signed_expires,
+                batch_mode=batch_mode, max_workers=max_workers,
+                image_format=image_format, quality=quality, compress_level=compress_level,
+                callback_url=callback_url, callback_mode=callback_mode, source="AzureImageNode", metrics=metrics,
             )
-            url = f"{url}?{sas}"
-
-        # 6) optional callback
-        if callback_url:
-            try:
-                requests.post(
-                    callback_url,
-                    json={"url": url, "path": path, "provider": "azure", "mime": mime, "size_bytes": len(data)},
-                    timeout=20,
-                )
-            except Exception as e:
-                print(f"[AzureImageNode] Callback failed: {e}")
+            return (image, url, [url], metrics.finish())
+        urls = upload_image_batch(
+            backend, image, blob_name_template, mime,
+            use_signed_url=use_signed_url, signed_expires=signed_expires,
+            batch_mode=batch_mode, max_workers=max_workers,
+            image_format=image_format, quality=quality, compress_level=compress_level,
+            dedup=dedup, dedup_verify_remote=dedup_verify_remote, async_upload=async_upload,
+            callback_url=callback_url, callback_mode=callback_mode, source="AzureImageNode", metrics=metrics,
+        )
 
-        # 7) passthrough image + url
-        return (image, url)
+        # passthrough image + url
+        return (image, "\n".join(urls), urls, metrics.finish())
 
 
 NODE_CLASS_MAPPINGS = {"AzureImageNode": AzureImageNode}
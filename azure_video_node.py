@@ -1,23 +1,20 @@
 # azure_video_node.py
+import json
 import os
-import time
-import requests
-from datetime import datetime, timedelta
-
-# Optional: load .env if present
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except Exception:
-    pass
-
-from azure.storage.blob import (
-    BlobServiceClient,
-    ContentSettings,
-    BlobSasPermissions,
-    generate_blob_sas,
+
+from .callbacks import CALLBACK_MODES, DEFAULT_MODE as DEFAULT_CALLBACK_MODE
+from .cloud_clients import load_dotenv_once
+from .upload_backends import AzureBackend, local_override
+from .upload_metrics import ENABLED as METRICS_ENABLED, start_metrics
+from .upload_pipeline import (
+    pick_path_from_vhs,
+    select_vhs_paths,
+    transfer_options,
+    upload_local_file,
+    upload_local_files,
 )
 
+
 class AzureVideoNode:
     """
     Upload a local VIDEO file (e.g., .mp4) to Azure Blob, return its URL,
@@ -30,10 +27,32 @@ class AzureVideoNode:
       4) AZURE_STORAGE_ACCOUNT + AZURE_STORAGE_KEY (env)
 
     It can also take the Video Helper Suite output directly via 'vhs_filenames'.
+
+    Files of at least `block_threshold_mb` are streamed from disk as blocks of
+    `block_size_mb`, staged `max_concurrency` at a time, then committed. With
+    `resumable` the staged block ids are journaled locally so a re-run after a
+    restart only stages the missing blocks.
+
+    With `dedup` the file is hashed ({sha256} is available in the blob name) and
+    the upload is skipped when the blob already holds identical bytes
+    (`dedup_verify_remote` adds a HEAD check).
+
+    With `async_upload` the node returns the URL right away and the background
+    queue uploads the file (it must stay on disk until then) and sends the callback.
+
+    With `upload_all` every VHS output (optionally filtered by `vhs_indices` /
+    `vhs_extensions`) is uploaded concurrently and a single callback
+    {"files": [...]} is sent; `url` is still the `prefer_index` file and `files`
+    is a JSON object mapping each local path to its URL. A failed file is marked
+    "error" in the callback and the node fails after the callback is sent.
+
+    With `collect_metrics` the `metrics` output is a JSON report of per-stage
+    timings and byte counts (encode, sign, upload, callback, ...).
     """
 
     @classmethod
     def INPUT_TYPES(cls):
+        load_dotenv_once()  # default container may come from .env
         return {
             "required": {
                 "file_path": ("STRING", {"default": "/home/azureuser/ComfyUI/output/video.mp4"}),
@@ -56,40 +75,32 @@ class AzureVideoNode:
                 "vhs_filenames": ("VHS_FILENAMES",),
                 # -1 picks the last file (usually the final video). 0=first entry, 1=second, etc.
                 "prefer_index": ("INT", {"default": -1, "min": -10, "max": 10}),
+                # Multi-file mode: upload every VHS entry (or those at `vhs_indices`, e.g. "0,-1",
+                # and/or with `vhs_extensions`, e.g. ".png,.mp4"); `files` maps local path -> URL
+                "upload_all": ("BOOLEAN", {"default": False}),
+                "vhs_indices": ("STRING", {"default": ""}),
+                "vhs_extensions": ("STRING", {"default": ""}),
+                # Parallel block staging for large files (smaller files use a single upload_blob)
+                "use_block_upload": ("BOOLEAN", {"default": True}),
+                "block_threshold_mb": ("INT", {"default": 64, "min": 1, "max": 5120}),
+                "block_size_mb": ("INT", {"default": 8, "min": 1, "max": 4000}),
+                "max_concurrency": ("INT", {"default": 4, "min": 1, "max": 32}),
+                "resumable": ("BOOLEAN", {"default": True}),
+                "async_upload": ("BOOLEAN", {"default": False}),
+                "dedup": ("BOOLEAN", {"default": False}),
+                "dedup_verify_remote": ("BOOLEAN", {"default": False}),
+                # sync | async (fire-and-forget) | async_batched (coalesced {"events": [...]} POSTs)
+                "callback_mode": (CALLBACK_MODES, {"default": DEFAULT_CALLBACK_MODE}),
+                # Per-stage timings/bytes on the `metrics` output (+ Prometheus file, see upload_metrics.py)
+                "collect_metrics": ("BOOLEAN", {"default": METRICS_ENABLED}),
             }
         }
 
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("url",)
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("url", "metrics", "files")
     FUNCTION = "upload"
     CATEGORY = "JLNodes/cloud"
 
-    # ---------- helpers ----------
-    def _get_service_client(self, connection_string, account_name, account_key):
-        cs = (connection_string or "").strip() or os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
-        if cs:
-            return BlobServiceClient.from_connection_string(cs), None, None
-
-        acct = (account_name or "").strip() or os.getenv("AZURE_STORAGE_ACCOUNT", "").strip()
-        key  = (account_key  or "").strip() or os.getenv("AZURE_STORAGE_KEY", "").strip()
-        if not acct or not key:
-            raise ValueError(
-                "Azure credentials missing: set connection_string OR account_name+account_key (or env vars)."
-            )
-        bsc = BlobServiceClient(account_url=f"https://{acct}.blob.core.windows.net", credential=key)
-        return bsc, acct, key
-
-    def _pick_path_from_vhs(self, vhs_filenames, prefer_index=-1):
-        # Expected VHS structure: (save_output:boolean, [png_path, mp4_path, ...])
-        try:
-            if isinstance(vhs_filenames, (list, tuple)) and len(vhs_filenames) >= 2:
-                paths = vhs_filenames[1]
-                if isinstance(paths, (list, tuple)) and len(paths) > 0:
-                    return str(paths[prefer_index])
-        except Exception as e:
-            print(f"[AzureVideoNode] Could not parse VHS_FILENAMES: {e}")
-        return None
-
     # ---------- main ----------
     def upload(
         self,
@@ -105,75 +116,49 @@ class AzureVideoNode:
         callback_url,
         vhs_filenames=None,
         prefer_index=-1,
+        upload_all=False,
+        vhs_indices="",
+        vhs_extensions="",
+        use_block_upload=True,
+        block_threshold_mb=64,
+        block_size_mb=8,
+        max_concurrency=4,
+        resumable=True,
+        async_upload=False,
+        dedup=False,
+        dedup_verify_remote=False,
+        callback_mode=DEFAULT_CALLBACK_MODE,
+        collect_metrics=METRICS_ENABLED,
     ):
-        # If VHS output provided, pick the mp4 path from it
-        if vhs_filenames is not None:
-            picked = self._pick_path_from_vhs(vhs_filenames, prefer_index)
-            if picked:
-                file_path = picked
-
-        file_path = (file_path or "").strip()
-        if not os.path.isfile(file_path):
-            print(f"[AzureVideoNode] File not found: {file_path}")
-            return ("",)
-
-        # Build client & container
-        bsc, acct, key = self._get_service_client(connection_string, account_name, account_key)
+        # Streaming, keys, dedup, queueing and callbacks live in upload_pipeline.py
+        load_dotenv_once()
         container = container_name.strip() or os.getenv("AZURE_BLOB_CONTAINER_VIDEOS", "videos")
-        container_client = bsc.get_container_client(container)
-        try:
-            container_client.create_container()
-        except Exception:
-            pass  # already exists
-
-        basename = os.path.basename(file_path)
-        timestamp = str(int(time.time()))
-        blob_name = (blob_name_template or "comfyui/videos/{basename}") \
-                        .replace("{basename}", basename) \
-                        .replace("{timestamp}", timestamp)
-
-        # Upload
-        with open(file_path, "rb") as f:
-            data = f.read()
-        container_client.upload_blob(
-            name=blob_name,
-            data=data,
-            overwrite=True,
-            content_settings=ContentSettings(content_type=mime),
+        metrics = start_metrics("AzureVideoNode", collect_metrics)
+        backend = local_override(container) or AzureBackend(container, connection_string, account_name, account_key)
+        template = blob_name_template or "comfyui/videos/{basename}"
+        options = dict(
+            use_signed_url=use_signed_url, signed_expires=signed_expires,
+            transfer=transfer_options(use_block_upload, block_threshold_mb, block_size_mb, max_concurrency, resumable),
+            dedup=dedup, dedup_verify_remote=dedup_verify_remote, async_upload=async_upload,
+            callback_url=callback_url, callback_mode=callback_mode, source="AzureVideoNode", metrics=metrics,
         )
 
-        # URL (public if container access is Blob; otherwise use SAS)
-        url = f"{container_client.url}/{blob_name}"
-
-        if use_signed_url:
-            if acct is None:
-                acct = bsc.account_name
-            if not key:
-                key = os.getenv("AZURE_STORAGE_KEY", "")
-            if not key:
-                raise ValueError("AZURE_STORAGE_KEY required to generate SAS when use_signed_url=True.")
-            sas = generate_blob_sas(
-                account_name=acct,
-                container_name=container,
-                blob_name=blob_name,
-                account_key=key,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(seconds=int(signed_expires)),
-            )
-            url = f"{url}?{sas}"
-
-        # Optional callback
-        if callback_url:
-            try:
-                requests.post(
-                    callback_url,
-                    json={"url": url, "provider": "azure", "mime": mime, "size_bytes": len(data)},
-                    timeout=20,
-                )
-            except Exception as e:
-                print(f"[AzureVideoNode] Callback failed: {e}")
-
-        return (url,)
+        # Multi-file mode: every selected VHS output, concurrently, one aggregated callback
+        if upload_all and vhs_filenames is not None:
+            paths = select_vhs_paths(vhs_filenames, vhs_indices, vhs_extensions, source="AzureVideoNode")
+            files = upload_local_files(backend, paths, template, mime, **options)
+            primary = pick_path_from_vhs(vhs_filenames, prefer_index, source="AzureVideoNode")
+            url = files.get(primary) or (list(files.values())[-1] if files else "")
+        else:
+            # If VHS output provided, pick the mp4 path from it
+            if vhs_filenames is not None:
+                picked = pick_path_from_vhs(vhs_filenames, prefer_index, source="AzureVideoNode")
+                if picked:
+                    file_path = picked
+            url = upload_local_file(backend, file_path, template, mime, **options)
+            files = {file_path.strip(): url} if url else {}
+
+        return (url, metrics.finish(), json.dumps(files))
 
 
 NODE_CLASS_MAPPINGS = {"AzureVideoNode": AzureVideoNode}
@@ -0,0 +1,318 @@
+# fake_object_store.py
+"""
+Minimal in-process HTTP server speaking just enough of the S3 and Azure Blob
+REST APIs for the upload nodes (used by upload_bench.py):
+
+  S3 (path-style, /<bucket>/<key>)
+    PUT / HEAD / DELETE object, multipart create / upload part / complete / abort
+  Azure (/<account>/<container>/<blob>)
+    create container, PUT / HEAD / DELETE blob, PUT block, PUT block list
+
+Authentication is not checked. Object bodies are read and counted, not kept
+(only size, metadata and the staged parts/blocks bookkeeping), so the server's
+memory use stays flat and the benchmark's peak RSS reflects the client side.
+An optional per-request latency simulates a remote endpoint.
+
+For the tests: part / block numbers put in `fail_parts` fail once with a 400
+(not retried by the SDKs), and committing a block list that names a block
+that isn't staged fails with InvalidBlockList, like Azure after its 7-day GC.
+"""
+import base64
+import hashlib
+import re
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+AZURE_ACCOUNT = "devstoreaccount1"
+# Well-known Azurite development key (the fake server does not verify signatures)
+AZURE_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_in = 0
+
+    def add(self, n):
+        with self.lock:
+            self.requests += 1
+            self.bytes_in += n
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "bytes_in": self.bytes_in}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+
+    def log_message(self, *args):
+        pass
+
+    # ---------- plumbing ----------
+
+    def _read_body(self, keep=False):
+        # Returns the payload size, or the payload itself with `keep` (small bodies only)
+        store = self.server.store
+        kept = bytearray()
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            size = 0
+            while True:
+                line = self.rfile.readline().split(b";")[0].strip()
+                n = int(line or b"0", 16)
+                if n == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    break
+                chunk = self.rfile.read(n)
+                size += len(chunk)
+                if keep:
+                    kept += chunk
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length") or 0)
+            size = 0
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                size += len(chunk)
+                remaining -= len(chunk)
+                if keep:
+                    kept += chunk
+        # aws-chunked bodies carry framing; report the payload size
+        decoded = self.headers.get("x-amz-decoded-content-length")
+        if decoded is not None:
+            size = int(decoded)
+        store.stats.add(size)
+        if store.latency:
+            time.sleep(store.latency)
+        return bytes(kept) if keep else size
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        headers = dict(headers or {})
+        headers.setdefault("Content-Length", str(len(body)))
+        headers.setdefault("Date", formatdate(usegmt=True))
+        headers.setdefault("x-ms-request-id", str(uuid.uuid4()))
+        headers.setdefault("x-amz-request-id", uuid.uuid4().hex)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+        segments = unquote(parts.path).lstrip("/").split("/", 2 if self._is_azure(parts.path) else 1)
+        return segments, query
+
+    def _fail_once(self, number):
+        store = self.server.store
+        with store.lock:
+            if number in store.fail_parts:
+                store.fail_parts.discard(number)
+                return True
+        return False
+
+    def _is_azure(self, path):
+        return path.lstrip("/").startswith(AZURE_ACCOUNT + "/") or any(h.lower().startswith("x-ms-") for h in self.headers)
+
+    def _meta(self, prefix):
+        return {k[len(prefix):].lower(): v for k, v in self.headers.items() if k.lower().startswith(prefix)}
+
+    # ---------- verbs ----------
+
+    def do_PUT(self):
+        segments, query = self._route()
+        if self._is_azure(self.path):
+            return self._azure_put(segments, query)
+        return self._s3_put(segments, query)
+
+    def do_POST(self):
+        segments, query = self._route()
+        self._read_body()
+        store = self.server.store
+        path = "/".join(segments)
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            with store.lock:
+                store.uploads[upload_id] = {"path": path, "parts": {}, "meta": self._meta("x-amz-meta-")}
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult>'
+                f"<Bucket>{segments[0]}</Bucket><Key>{segments[-1]}</Key><UploadId>{upload_id}</UploadId>"
+                "</InitiateMultipartUploadResult>"
+            ).encode()
+            return self._reply(200, body, {"Content-Type": "application/xml"})
+        if "uploadId" in query:
+            with store.lock:
+                upload = store.uploads.pop(query["uploadId"], None)
+                if upload is None:
+                    return self._s3_error(404, "NoSuchUpload")
+                store.objects[path] = {"size": sum(upload["parts"].values()), "meta": upload["meta"]}
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult>'
+                f"<Bucket>{segments[0]}</Bucket><Key>{segments[-1]}</Key><ETag>\"{uuid.uuid4().hex}\"</ETag>"
+                "</CompleteMultipartUploadResult>"
+            ).encode()
+            return self._reply(200, body, {"Content-Type": "application/xml"})
+        self._s3_error(400, "InvalidRequest")
+
+    def do_DELETE(self):
+        segments, query = self._route()
+        store = self.server.store
+        with store.lock:
+            if "uploadId" in query:
+                store.uploads.pop(query["uploadId"], None)
+            else:
+                store.objects.pop("/".join(segments), None)
+        self._reply(202 if self._is_azure(self.path) else 204)
+
+    def do_HEAD(self):
+        segments, _ = self._route()
+        azure = self._is_azure(self.path)
+        store = self.server.store
+        with store.lock:
+            obj = store.objects.get("/".join(segments))
+        if obj is None:
+            headers = {"x-ms-error-code": "BlobNotFound"} if azure else {}
+            return self._reply(404, b"", headers)
+        prefix = "x-ms-meta-" if azure else "x-amz-meta-"
+        headers = {prefix + k: v for k, v in obj["meta"].items()}
+        headers.update({
+            "ETag": '"0x1"',
+            "Last-Modified": formatdate(usegmt=True),
+            "Content-Type": "application/octet-stream",
+            "x-ms-blob-type": "BlockBlob",
+        })
+        self.send_response(200)
+        headers["Content-Length"] = str(obj["size"])
+        headers["Date"] = formatdate(usegmt=True)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+
+    # ---------- S3 ----------
+
+    def _s3_error(self, status, code):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{code}</Message></Error>'.encode()
+        self._reply(status, body, {"Content-Type": "application/xml"})
+
+    def _s3_put(self, segments, query):
+        store = self.server.store
+        size = self._read_body()
+        path = "/".join(segments)
+        etag = '"%s"' % hashlib.md5(f"{path}:{size}:{time.time()}".encode()).hexdigest()
+        if "uploadId" in query:
+            number = int(query["partNumber"])
+            if self._fail_once(number):
+                return self._s3_error(400, "InvalidRequest")
+            with store.lock:
+                upload = store.uploads.get(query["uploadId"])
+                if upload is None:
+                    return self._s3_error(404, "NoSuchUpload")
+                upload["parts"][number] = size
+            return self._reply(200, b"", {"ETag": etag})
+        with store.lock:
+            store.objects[path] = {"size": size, "meta": self._meta("x-amz-meta-")}
+        self._reply(200, b"", {"ETag": etag})
+
+    # ---------- Azure ----------
+
+    def _azure_error(self, status, code):
+        body = f'<?xml version="1.0" encoding="utf-8"?><Error><Code>{code}</Code><Message>{code}</Message></Error>'.encode()
+        self._reply(status, body, {"Content-Type": "application/xml", "x-ms-error-code": code})
+
+    def _azure_put(self, segments, query):
+        store = self.server.store
+        comp = query.get("comp")
+        body = self._read_body(keep=comp == "blocklist")
+        size = len(body) if comp == "blocklist" else body
+        ok = {"ETag": '"0x1"', "Last-Modified": formatdate(usegmt=True), "x-ms-request-server-encrypted": "true"}
+        container = "/".join(segments[:2])
+
+        if query.get("restype") == "container":
+            with store.lock:
+                exists = container in store.containers
+                store.containers.add(container)
+            if exists:
+                return self._azure_error(409, "ContainerAlreadyExists")
+            return self._reply(201, b"", ok)
+
+        with store.lock:
+            if container not in store.containers:
+                return self._azure_error(404, "ContainerNotFound")
+
+        path = "/".join(segments)
+        if comp == "block":
+            if self._fail_once(int(base64.b64decode(query["blockid"]))):
+                return self._azure_error(400, "InvalidInput")
+            with store.lock:
+                store.blocks.setdefault(path, {})[query["blockid"]] = size
+            return self._reply(201, b"", ok)
+        if comp == "blocklist":
+            listed = re.findall(rb"<(?:Latest|Uncommitted|Committed)>([^<]*)<", body)
+            with store.lock:
+                staged = store.blocks.get(path, {})
+                if any(block.decode() not in staged for block in listed):
+                    return self._azure_error(400, "InvalidBlockList")
+                staged = store.blocks.pop(path, {})
+                store.objects[path] = {"size": sum(staged.values()), "meta": self._meta("x-ms-meta-")}
+            return self._reply(201, b"", ok)
+        if comp is None:
+            with store.lock:
+                store.objects[path] = {"size": size, "meta": self._meta("x-ms-meta-")}
+            return self._reply(201, b"", ok)
+        self._reply(201, b"", ok)
+
+
+class FakeObjectStore:
+    """
+    Start with `start()`, point the clients at it with `s3_endpoint` /
+    `azure_connection_string`, stop with `stop()`.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0):
+        self.lock = threading.Lock()
+        self.objects = {}     # "bucket/key" or "account/container/blob" -> {"size", "meta"}
+        self.uploads = {}     # S3 upload id -> {"path", "parts", "meta"}
+        self.blocks = {}      # Azure blob path -> {block id: size}
+        self.containers = set()
+        self.fail_parts = set()  # part / block numbers whose next upload fails
+        self.stats = _Stats()
+        self.latency = latency_ms / 1000.0
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.store = self
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def s3_endpoint(self):
+        return self.endpoint
+
+    @property
+    def azure_connection_string(self):
+        return (
+            f"DefaultEndpointsProtocol=http;AccountName={AZURE_ACCOUNT};AccountKey={AZURE_KEY};"
+            f"BlobEndpoint={self.endpoint}/{AZURE_ACCOUNT};"
+        )
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-object-store", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,115 @@
+# import_check.py
+"""
+Import-time guard for the cloud nodes.
+
+Imports the cloud node modules in a fresh interpreter under
+`python -X importtime` (as ComfyUI does at startup, minus __init__.py which
+also needs ComfyUI for the latent/conditioning nodes) and fails if
+
+  - any heavy SDK got imported (boto3, azure, requests, PIL, dotenv, ...),
+    those must only be imported on first execution, or
+  - the cumulative import time of the node modules exceeds --budget-ms.
+
+  python benchmarks/import_check.py
+  python benchmarks/import_check.py --budget-ms 50 --top 15
+
+Exit status 0 = ok, 1 = regression.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(HERE)
+PACKAGE = "jlnodes_import_check"
+
+CLOUD_MODULES = (
+    "s3_image_node",
+    "s3_video_node",
+    "azure_image_node",
+    "azure_video_node",
+    "upload_queue_status_node",
+    "multi_upload_image_node",
+    "output_sync_node",
+)
+HEAVY_MODULES = (
+    "boto3",
+    "botocore",
+    "azure",
+    "requests",
+    "urllib3",
+    "PIL",
+    "numpy",
+    "dotenv",
+)
+
+_CHILD = """
+import json, sys, types
+pkg = types.ModuleType({package!r})
+pkg.__path__ = [{repo!r}]
+sys.modules[{package!r}] = pkg
+mappings = {{}}
+for name in {modules!r}:
+    module = __import__({package!r} + "." + name, fromlist=["NODE_CLASS_MAPPINGS"])
+    mappings.update(module.NODE_CLASS_MAPPINGS)
+heavy = sorted(m for m in sys.modules if m.split(".")[0] in {heavy!r})
+print(json.dumps({{"nodes": sorted(mappings), "heavy": heavy}}))
+"""
+
+# import time:  self [us] | cumulative | imported package
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def measure():
+    code = _CHILD.format(package=PACKAGE, repo=REPO_DIR, modules=CLOUD_MODULES, heavy=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=REPO_DIR,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing the node modules failed:\n{proc.stderr}")
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    entries = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            entries.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3))))
+    # Only the top-level imports done by the child: their cumulative time
+    # includes everything the node modules pulled in.
+    depth = min((d for name, _, _, d in entries if name.startswith(PACKAGE + ".")), default=0)
+    result["total_us"] = sum(c for name, _, c, d in entries if name.startswith(PACKAGE + ".") and d == depth)
+    result["entries"] = entries
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="max cumulative import time of the node modules")
+    parser.add_argument("--top", type=int, default=10, help="show the N slowest imports (self time)")
+    args = parser.parse_args(argv)
+
+    result = measure()
+    total_ms = result["total_us"] / 1000
+    print(f"Registered {len(result['nodes'])} nodes: {', '.join(result['nodes'])}")
+    print(f"Cumulative import time: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, self_us, _, _ in sorted(result["entries"], key=lambda e: -e[1])[:args.top]:
+        print(f"  {self_us / 1000:8.2f} ms  {name}")
+
+    failed = False
+    if result["heavy"]:
+        print(f"FAIL: heavy modules imported at registration: {', '.join(result['heavy'])}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+# upload_bench.py
+"""
+Throughput / latency benchmark of the cloud upload nodes (S3ImageNode,
+S3VideoNode, AzureImageNode, AzureVideoNode) against the in-process fake
+object store (fake_object_store.py) - no credentials or network needed.
+
+Runs a matrix of image sizes x batch sizes x concurrency (image nodes) and
+video sizes x concurrency (video nodes), and reports per case:
+  p50_ms / p99_ms / mean_ms  node call latency over --repeat runs
+  mb_per_s                   bytes received by the fake store / total time
+  peak_rss_mb                peak resident memory of the process during the case
+Results are written as JSON (benchmarks/results/ by default) so runs can be
+compared over time with --compare.
+
+Run from a Python environment with torch, boto3 and azure-storage-blob
+(e.g. ComfyUI's):
+
+  python benchmarks/upload_bench.py                 # full matrix
+  python benchmarks/upload_bench.py --quick         # smoke run
+  python benchmarks/upload_bench.py --nodes S3VideoNode --video-mb 64,256
+  python benchmarks/upload_bench.py --compare benchmarks/results/<old>.json
+
+With few repeats p99 is close to the max; raise --repeat for stable tails.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from fake_object_store import FakeObjectStore  # noqa: E402
+
+MB = 1024 * 1024
+PACKAGE = "jlnodes_bench"
+IMAGE_NODES = ("S3ImageNode", "AzureImageNode")
+VIDEO_NODES = ("S3VideoNode", "AzureVideoNode")
+NODE_MODULES = {
+    "S3ImageNode": "s3_image_node",
+    "AzureImageNode": "azure_image_node",
+    "S3VideoNode": "s3_video_node",
+    "AzureVideoNode": "azure_video_node",
+}
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+# ---------- environment ----------
+
+def _configure_env(store, state_dir):
+    # Must run before the node modules are imported: they read env at import time.
+    os.environ.update({
+        "AWS_ENDPOINT_URL": store.s3_endpoint,
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AZURE_STORAGE_CONNECTION_STRING": store.azure_connection_string,
+        "JLNODES_STATE_DIR": state_dir,
+        "JLNODES_CALLBACK_MODE": "sync",
+    })
+    os.environ.pop("JLNODES_UPLOAD_BACKEND", None)
+
+
+def _load_nodes():
+    """
+    Import the node modules as a package without running __init__.py,
+    which also registers the latent/conditioning nodes and needs ComfyUI.
+    """
+    pkg = types.ModuleType(PACKAGE)
+    pkg.__path__ = [REPO_DIR]
+    sys.modules[PACKAGE] = pkg
+    nodes = {}
+    for name, module in NODE_MODULES.items():
+        nodes[name] = getattr(importlib.import_module(f"{PACKAGE}.{module}"), name)
+    return nodes
+
+
+# ---------- measurement ----------
+
+def _rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class _PeakRss:
+    """Sample RSS on a background thread while the block runs."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def _percentile(values, pct):
+    # nearest-rank
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _measure(store, call, repeat, warmup):
+    for _ in range(warmup):
+        call()
+    before = store.stats.snapshot()
+    latencies = []
+    with _PeakRss() as rss:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+    after = store.stats.snapshot()
+    total_bytes = after["bytes_in"] - before["bytes_in"]
+    total_time = sum(latencies)
+    return {
+        "runs": repeat,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(total_time / repeat * 1000, 3),
+        "mb_per_s": round(total_bytes / MB / total_time, 3) if total_time else 0.0,
+        "bytes": total_bytes,
+        "requests": after["requests"] - before["requests"],
+        "peak_rss_mb": round(rss.peak / MB, 1),
+    }
+
+
+# ---------- cases ----------
+
+def _image_call(node_name, node, image, workers, image_format):
+    common = dict(
+        image=image, mime="image/png", use_signed_url=False, callback_url="",
+        batch_mode=True, max_workers=workers, image_format=image_format,
+    )
+    if node_name == "S3ImageNode":
+        return lambda: node.upload(bucket="bench", key_template="bench/{timestamp}.png", region="us-east-1", **common)
+    return lambda: node.upload(
+        container_name="bench", blob_name_template="bench/{timestamp}.png",
+        connection_string="", account_name="", account_key="", signed_expires=3600, **common,
+    )
+
+
+def _video_call(node_name, node, file_path, concurrency, part_mb):
+    common = dict(
+        file_path=file_path, mime="video/mp4", use_signed_url=False, signed_expires=3600,
+        callback_url="", max_concurrency=concurrency, resumable=False,
+    )
+    if node_name == "S3VideoNode":
+        return lambda: node.upload(
+            bucket="bench", key_template="bench/{basename}", region="us-east-1",
+            use_multipart=True, multipart_threshold_mb=part_mb, part_size_mb=part_mb, **common,
+        )
+    return lambda: node.upload(
+        container_name="bench", blob_name_template="bench/{basename}",
+        connection_string="", account_name="", account_key="",
+        use_block_upload=True, block_threshold_mb=part_mb, block_size_mb=part_mb, **common,
+    )
+
+
+def _make_video(directory, size_mb):
+    path = os.path.join(directory, f"bench_{size_mb}mb.mp4")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(MB))
+    return path
+
+
+def run(args):
+    store = FakeObjectStore(latency_ms=args.latency_ms).start()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="jlnodes-bench-") as tmp:
+        _configure_env(store, os.path.join(tmp, "state"))
+        nodes = _load_nodes()
+        selected = [n for n in args.nodes.split(",") if n] if args.nodes else list(NODE_MODULES)
+
+        for node_name in selected:
+            node = nodes[node_name]()
+            if node_name in IMAGE_NODES:
+                import torch
+
+                for size in _ints(args.image_sizes):
+                    for batch in _ints(args.batch_sizes):
+                        image = torch.rand(batch, size, size, 3)
+                        for workers in _ints(args.concurrency):
+                            case = {"node": node_name, "image_size": size, "batch": batch,
+                                    "concurrency": workers, "image_format": args.image_format}
+                            call = _image_call(node_name, node, image, workers, args.image_format)
+                            results.append(_report(case, _measure(store, call, args.repeat, args.warmup)))
+            else:
+                for size_mb in _ints(args.video_mb):
+                    file_path = _make_video(tmp, size_mb)
+                    for concurrency in _ints(args.concurrency):
+                        case = {"node": node_name, "video_mb": size_mb,
+                                "concurrency": concurrency, "part_mb": args.part_mb}
+                        call = _video_call(node_name, node, file_path, concurrency, args.part_mb)
+                        results.append(_report(case, _measure(store, call, args.repeat, args.warmup)))
+    store.stop()
+    return results
+
+
+def _case_id(case):
+    return ",".join(f"{k}={v}" for k, v in sorted(case.items()))
+
+
+def _report(case, metrics):
+    print(f"{_case_id(case):<75} p50 {metrics['p50_ms']:>9.1f} ms  p99 {metrics['p99_ms']:>9.1f} ms  "
+          f"{metrics['mb_per_s']:>8.1f} MB/s  rss {metrics['peak_rss_mb']:>7.1f} MB")
+    return {"case": case, **metrics}
+
+
+# ---------- output ----------
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except Exception:
+        return ""
+
+
+def _compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {_case_id(r["case"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}")
+    for r in results:
+        old = baseline.get(_case_id(r["case"]))
+        if old is None:
+            continue
+        p50 = (r["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        mbps = (r["mb_per_s"] / old["mb_per_s"] - 1) * 100 if old["mb_per_s"] else 0.0
+        print(f"{_case_id(r['case']):<75} p50 {p50:+7.1f}%  MB/s {mbps:+7.1f}%  "
+              f"rss {r['peak_rss_mb'] - old['peak_rss_mb']:+7.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", default="", help="comma-separated node names (default: all four)")
+    parser.add_argument("--image-sizes", default="512,1024", help="square image sizes in px")
+    parser.add_argument("--batch-sizes", default="1,4,16")
+    parser.add_argument("--image-format", default="png", help="png, jpeg, webp or webp_lossless")
+    parser.add_argument("--video-mb", default="8,64,256", help="video file sizes in MB")
+    parser.add_argument("--part-mb", type=int, default=16, help="multipart part / block size (and threshold) in MB")
+    parser.add_argument("--concurrency", default="1,4,8", help="max_workers (images) / max_concurrency (videos)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated server latency per request")
+    parser.add_argument("--quick", action="store_true", help="small matrix for a smoke run")
+    parser.add_argument("--output", default="", help="JSON results path (default benchmarks/results/upload-<time>.json)")
+    parser.add_argument("--compare", default="", help="previous results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.image_sizes, args.batch_sizes, args.video_mb = "256", "1,4", "8"
+        args.concurrency, args.part_mb, args.repeat = "1,4", 5, 3
+
+    started = datetime.now(timezone.utc)
+    results = run(args)
+
+    output = args.output or os.path.join(HERE, "results", f"upload-{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "started": started.isoformat(),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nWrote {len(results)} results to {output}")
+
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# callbacks.py
+"""
+Shared dispatcher for the upload nodes' HTTP callbacks.
+
+All callbacks go through one pooled requests.Session (keep-alive) with a
+per-request timeout and retries with jittered exponential backoff on
+connection errors, 429 and 5xx. Modes:
+
+  sync           POST before the node returns (default)
+  async          POST from a background thread, the node does not wait
+  async_batched  like async, but callbacks to the same URL arriving within
+                 JLNODES_CALLBACK_BATCH_WINDOW seconds are coalesced into one
+                 POST of {"events": [payload, ...]} (the endpoint must accept it)
+
+Env:
+  JLNODES_CALLBACK_TIMEOUT       seconds per request (default 20)
+  JLNODES_CALLBACK_RETRIES       retries after the first attempt (default 3)
+  JLNODES_CALLBACK_MODE          default mode for the nodes (default "sync")
+  JLNODES_CALLBACK_BATCH_WINDOW  coalescing window in seconds (default 0.5)
+  JLNODES_CALLBACK_BATCH_MAX     max events per batched POST (default 100)
+"""
+import atexit
+import os
+import queue
+import random
+import threading
+import time
+
+CALLBACK_MODES = ["sync", "async", "async_batched"]
+DEFAULT_MODE = os.getenv("JLNODES_CALLBACK_MODE", "sync")
+TIMEOUT = float(os.getenv("JLNODES_CALLBACK_TIMEOUT", "20"))
+RETRIES = int(os.getenv("JLNODES_CALLBACK_RETRIES", "3"))
+BATCH_WINDOW = float(os.getenv("JLNODES_CALLBACK_BATCH_WINDOW", "0.5"))
+BATCH_MAX = int(os.getenv("JLNODES_CALLBACK_BATCH_MAX", "100"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+
+_session = None
+_session_lock = threading.Lock()
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _post(url, payload, source):
+    """POST with retries. Never raises: callback failures are logged, not fatal."""
+    session = _get_session()
+    for attempt in range(RETRIES + 1):
+        error = None
+        try:
+            resp = session.post(url, json=payload, timeout=TIMEOUT)
+            if resp.status_code < 500 and resp.status_code != 429:
+                if resp.status_code >= 400:
+                    print(f"[{source}] Callback rejected: HTTP {resp.status_code}")
+                return resp.status_code < 400
+            error = f"HTTP {resp.status_code}"
+        except Exception as e:
+            error = str(e)
+
+        if attempt < RETRIES:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+            time.sleep(delay)
+        else:
+            print(f"[{source}] Callback failed after {RETRIES + 1} attempts: {error}")
+    return False
+
+
+def send_callback(url, payload, mode=None, source="JLNodes"):
+    """Deliver `payload` to `url` according to `mode` (see module docstring). No-op without a URL."""
+    if not url:
+        return
+    mode = mode or DEFAULT_MODE
+    if mode == "sync":
+        _post(url, payload, source)
+        return
+    _ensure_worker()
+    _queue.put((url, payload, source, mode == "async_batched"))
+
+
+# ---------- background delivery ----------
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="jlnodes-callbacks", daemon=True)
+            _worker.start()
+
+
+def _run():
+    while True:
+        url, payload, source, batched = _queue.get()
+        if not batched:
+            _post(url, payload, source)
+            _queue.task_done()
+            continue
+
+        # Coalesce the burst: collect more events for the same URL within the window
+        events = [payload]
+        others = []
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(events) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                nxt = _queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if nxt[3] and nxt[0] == url:
+                events.append(nxt[1])
+            else:
+                others.append(nxt)
+
+        _post(url, {"events": events}, source)
+        for _ in events:
+            _queue.task_done()
+        for other in others:
+            # Requeue; they were already counted by the queue and are done here
+            _queue.put(other)
+            _queue.task_done()
+
+
+def flush(timeout=None):
+    """Wait for queued async callbacks to be delivered. Returns True if the queue drained."""
+    if _worker is None:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@atexit.register
+def _flush_at_exit():
+    if not flush(timeout=TIMEOUT):
+        print("[callbacks] Exiting with undelivered async callbacks")
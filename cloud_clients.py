@@ -0,0 +1,277 @@
+# cloud_clients.py
+"""
+Process-wide pool of storage clients shared by the S3 and Azure upload nodes.
+
+Building a boto3 client or a BlobServiceClient means a new session, credential
+resolution and TLS handshake. Clients here are cached per
+(provider, region/account, credential fingerprint) so connection pools are
+reused across executions. Idle clients are evicted after
+JLNODES_CLIENT_IDLE_TTL seconds (default 600). Eviction only drops the pool's
+reference, it never closes the client: an upload that fetched it earlier
+(a long multipart / block upload) keeps using it, and it is garbage-collected
+once the last user is done. Clients are built outside the pool lock, so a
+slow first build (boto3 import) doesn't block lookups of other clients.
+
+Azure containers that were created/verified once are remembered for
+JLNODES_CONTAINER_TTL seconds (default 3600) so uploads skip create_container.
+
+Azure secrets given as node inputs are kept in memory only
+(remember_credentials): queued jobs store a fingerprint of them, never the
+secret, and recall it when they run.
+
+boto3, the Azure SDK and python-dotenv are imported on first use, not when
+ComfyUI loads the nodes (see benchmarks/import_check.py).
+"""
+import hashlib
+import os
+import threading
+import time
+
+from .upload_limits import BURST_BYTES, BYTES_PER_SEC
+
+IDLE_TTL = float(os.getenv("JLNODES_CLIENT_IDLE_TTL", "600"))
+MAX_POOL_CONNECTIONS = int(os.getenv("JLNODES_MAX_POOL_CONNECTIONS", "32"))
+CONTAINER_TTL = float(os.getenv("JLNODES_CONTAINER_TTL", "3600"))
+
+_lock = threading.Lock()
+_clients = {}  # key -> [client, last_used]
+_building = {}  # key -> Lock held while that client is built
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_containers = {}  # container url -> expires_at (monotonic)
+_credentials = {}  # fingerprint -> (connection_string, account_key) from node inputs
+_dotenv_loaded = False
+
+# Env vars that change which credentials boto3 resolves.
+_AWS_ENV = (
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "AWS_SESSION_TOKEN",
+    "AWS_PROFILE",
+    "AWS_ENDPOINT_URL",
+    "AWS_ENDPOINT_URL_S3",
+)
+
+
+def _fingerprint(*parts):
+    # Never keep raw secrets in the registry key.
+    raw = "\0".join(p or "" for p in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _evict_idle(now):
+    # Caller holds _lock. Not closed: uploads may still hold the client (see above).
+    stale = [k for k, (_, last_used) in _clients.items() if now - last_used > IDLE_TTL]
+    for k in stale:
+        del _clients[k]
+        _stats["evictions"] += 1
+
+
+def _lookup(key, now):
+    # Caller holds _lock.
+    entry = _clients.get(key)
+    if entry is None:
+        return None
+    entry[1] = now
+    _stats["hits"] += 1
+    return entry[0]
+
+
+def _get_or_create(key, factory):
+    now = time.monotonic()
+    with _lock:
+        _evict_idle(now)
+        client = _lookup(key, now)
+        if client is not None:
+            return client
+        building = _building.setdefault(key, threading.Lock())
+
+    # One build per key at a time; other keys are served meanwhile
+    with building:
+        with _lock:
+            client = _lookup(key, time.monotonic())
+            if client is not None:
+                return client
+            _stats["misses"] += 1
+        client = factory()
+        with _lock:
+            _clients[key] = [client, time.monotonic()]
+            _building.pop(key, None)
+        return client
+
+
+# ---------- .env ----------
+
+def load_dotenv_once():
+    """Load .env (if python-dotenv is installed) the first time credentials are needed."""
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except Exception:
+        pass
+
+
+# ---------- S3 ----------
+
+def get_s3_client(region):
+    """Return a shared boto3 S3 client for `region` and the current AWS credentials."""
+    load_dotenv_once()
+    region = (region or "").strip()
+    key = ("s3", region, _fingerprint(*(os.getenv(name, "") for name in _AWS_ENV)))
+
+    def factory():
+        import boto3
+        from botocore.config import Config
+
+        # A private session per client: the boto3 default session is not thread-safe.
+        session = boto3.session.Session()
+        return session.client(
+            "s3",
+            region_name=region or None,
+            config=Config(
+                max_pool_connections=MAX_POOL_CONNECTIONS,
+                # botocore reads the body once: no checksum / payload-signing passes.
+                # Uploads send a precomputed ContentMD5 instead (cloud_transfer.content_md5),
+                # so a paced body is paid for once (see upload_limits.py).
+                request_checksum_calculation="when_required",
+                s3={"payload_signing_enabled": False},
+            ),
+        )
+
+    return _get_or_create(key, factory)
+
+
+# ---------- Azure ----------
+
+def _azure_client_options():
+    # The SDK reads a single-put body (and each block of its own chunked upload)
+    # whole before sending it; with a bandwidth cap keep those within one bucket
+    # so a paced body can't leave as a bigger burst (see upload_limits.py).
+    if BYTES_PER_SEC <= 0:
+        return {}
+    size = int(BURST_BYTES)
+    return {"max_single_put_size": size, "max_block_size": size}
+
+
+def get_blob_service_client(connection_string, account_name, account_key):
+    """
+    Return (BlobServiceClient, account_name, account_key) using the same credential
+    priority as the Azure nodes:
+      1) connection_string
+      2) env AZURE_STORAGE_CONNECTION_STRING
+      3) account_name + account_key
+      4) env AZURE_STORAGE_ACCOUNT + AZURE_STORAGE_KEY
+
+    account_name/account_key are None when a connection string is used.
+    """
+    from azure.storage.blob import BlobServiceClient
+
+    load_dotenv_once()
+    cs = (connection_string or "").strip() or os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
+    if cs:
+        key = ("azure", "connection_string", _fingerprint(cs))
+        bsc = _get_or_create(key, lambda: BlobServiceClient.from_connection_string(cs, **_azure_client_options()))
+        return bsc, None, None
+
+    acct = (account_name or "").strip() or os.getenv("AZURE_STORAGE_ACCOUNT", "").strip()
+    secret = (account_key or "").strip() or os.getenv("AZURE_STORAGE_KEY", "").strip()
+    if not acct or not secret:
+        raise ValueError(
+            "Azure credentials missing: set connection_string OR account_name+account_key (or env vars)."
+        )
+    key = ("azure", acct, _fingerprint(secret))
+    bsc = _get_or_create(
+        key,
+        lambda: BlobServiceClient(
+            account_url=f"https://{acct}.blob.core.windows.net", credential=secret, **_azure_client_options(),
+        ),
+    )
+    return bsc, acct, secret
+
+
+def remember_credentials(connection_string, account_key):
+    """
+    Keep node-input Azure secrets in memory and return the reference queued jobs
+    store instead of them ("" when there are none: env credentials are used).
+    """
+    connection_string = (connection_string or "").strip()
+    account_key = (account_key or "").strip()
+    if not connection_string and not account_key:
+        return ""
+    ref = _fingerprint(connection_string, account_key)
+    with _lock:
+        _credentials[ref] = (connection_string, account_key)
+    return ref
+
+
+def recall_credentials(ref):
+    """(connection_string, account_key) remembered under `ref` in this process, or None."""
+    with _lock:
+        return _credentials.get(ref)
+
+
+# ---------- Azure containers ----------
+
+def ensure_container(container_client):
+    """Create the container once per process (per CONTAINER_TTL) instead of on every upload."""
+    url = container_client.url
+    now = time.monotonic()
+    with _lock:
+        expires_at = _containers.get(url)
+        if expires_at is not None and expires_at > now:
+            return
+
+    try:
+        container_client.create_container()
+    except Exception:
+        pass  # already exists (or no create permission: the upload will tell us)
+
+    with _lock:
+        _containers[url] = now + CONTAINER_TTL
+
+
+def forget_container(container_client):
+    with _lock:
+        _containers.pop(container_client.url, None)
+
+
+def _is_container_not_found(e):
+    return getattr(e, "error_code", None) == "ContainerNotFound"
+
+
+def upload_to_container(container_client, upload):
+    """
+    Run `upload()` against a container known to exist. If the container vanished
+    (ContainerNotFound) the cache entry is dropped, the container re-created and
+    the upload retried once.
+    """
+    ensure_container(container_client)
+    try:
+        return upload()
+    except Exception as e:
+        if not _is_container_not_found(e):
+            raise
+        forget_container(container_client)
+        ensure_container(container_client)
+        return upload()
+
+
+# ---------- stats ----------
+
+def client_cache_stats():
+    """Snapshot of hit/miss/eviction counters plus the number of live clients."""
+    with _lock:
+        stats = dict(_stats)
+        stats["clients"] = len(_clients)
+        stats["known_containers"] = len(_containers)
+    return stats
+
+
+def clear_clients():
+    """Drop every pooled client (e.g. after rotating credentials); in-flight uploads keep theirs."""
+    with _lock:
+        _clients.clear()
+        _containers.clear()
@@ -0,0 +1,326 @@
+# cloud_transfer.py
+"""
+Streaming transfers for large files.
+
+Parts are read from disk inside the worker that uploads them, so at most
+`max_concurrency` parts are held in memory at once regardless of file size.
+
+Pass an UploadJournal (upload_journal.py) to make a transfer resumable: finished
+parts are journaled and skipped when the same file is uploaded again.
+
+`s3_stream_upload` / `azure_stream_upload` upload data of unknown size (e.g.
+an archive being written) through a PartStream: the writer fills one part at
+a time and at most `max_concurrency` parts are in flight, so memory stays at
+about (max_concurrency + 1) * part_size however much is written.
+
+Every part / block goes through upload_limits.transfer and is sent as its paced
+body, so they count against the process-wide transfer and bandwidth limits.
+"""
+import base64
+import hashlib
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .upload_limits import transfer
+
+MB = 1024 * 1024
+
+# S3 multipart limits
+S3_MIN_PART_SIZE = 5 * MB
+S3_MAX_PARTS = 10000
+
+# Azure block blob limits
+AZURE_MAX_BLOCKS = 50000
+
+
+def read_range(file_path, offset, length):
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def content_md5(data):
+    """
+    Base64 MD5 of `data` (bytes, or a file read from its current position and
+    rewound) for S3's ContentMD5, so the service verifies the body without
+    botocore reading it a second time.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+    position = data.tell()
+    md5 = hashlib.md5()
+    for chunk in iter(lambda: data.read(MB), b""):
+        md5.update(chunk)
+    data.seek(position)
+    return base64.b64encode(md5.digest()).decode("ascii")
+
+
+def plan_parts(size, part_size, min_part_size=1, max_parts=None):
+    """Split `size` bytes into [(part_number, offset, length), ...] (1-based part numbers)."""
+    part_size = max(int(part_size), min_part_size)
+    if max_parts and math.ceil(size / part_size) > max_parts:
+        part_size = math.ceil(size / max_parts)
+    parts = []
+    offset = 0
+    number = 1
+    while offset < size:
+        length = min(part_size, size - offset)
+        parts.append((number, offset, length))
+        offset += length
+        number += 1
+    return parts
+
+
+class PartStream:
+    """
+    Write-only file object that cuts everything written to it into `part_size`
+    parts and calls `send(part_number, data)` for each on a thread pool.
+    write() blocks while `max_concurrency` parts are in flight; close() sends
+    the last (short) part and returns the results of `send` in part order.
+    """
+
+    def __init__(self, send, part_size, max_concurrency=4):
+        self._send = send
+        self._part_size = int(part_size)
+        self._buf = bytearray()
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(max(1, int(max_concurrency)))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_concurrency)))
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buf += data
+        self.size += len(data)
+        while len(self._buf) >= self._part_size:
+            part = bytes(self._buf[:self._part_size])
+            del self._buf[:self._part_size]
+            self._submit(part)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _submit(self, part):
+        # Fail fast instead of encoding the rest of the stream after a part failed
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        self._slots.acquire()
+        future = self._pool.submit(self._send, len(self._futures) + 1, part)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def close(self):
+        if self._buf or not self._futures:
+            self._submit(bytes(self._buf))
+            self._buf = bytearray()
+        try:
+            return [future.result() for future in self._futures]
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def abort(self):
+        for future in self._futures:
+            future.cancel()
+        self._pool.shutdown(wait=True)
+
+
+# ---------- S3 ----------
+
+def _s3_error_code(e):
+    response = getattr(e, "response", None) or {}
+    return response.get("Error", {}).get("Code")
+
+
+def s3_multipart_upload(s3, bucket, key, file_path, mime, part_size=16 * MB, max_concurrency=4, journal=None, metadata=None):
+    """
+    Upload `file_path` to s3://bucket/key with a multipart upload whose parts are
+    streamed from disk and sent concurrently.
+
+    Without a journal the multipart upload is aborted on failure. With one it is
+    kept so the next call only sends the missing parts. Returns the object's ETag.
+    """
+    size = os.path.getsize(file_path)
+    parts = plan_parts(size, part_size, S3_MIN_PART_SIZE, S3_MAX_PARTS)
+
+    resumed = journal is not None and journal.load() and bool(journal.session.get("upload_id"))
+    if resumed:
+        upload_id = journal.session["upload_id"]
+        done = dict(journal.parts)
+        print(f"[cloud_transfer] Resuming s3://{bucket}/{key}: {len(done)}/{len(parts)} parts already uploaded")
+    else:
+        upload_id = s3.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=mime, Metadata=metadata or {},
+        )["UploadId"]
+        done = {}
+        if journal is not None:
+            journal.start(bucket=bucket, key=key, region=s3.meta.region_name, upload_id=upload_id)
+
+    def upload_part(part):
+        number, offset, length = part
+        if number in done:
+            return {"PartNumber": number, "ETag": done[number]}
+        with transfer(length) as t:
+            body = read_range(file_path, offset, length)
+            resp = s3.upload_part(
+                Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=t.body(body),
+                ContentLength=length, ContentMD5=content_md5(body),
+            )
+        if journal is not None:
+            journal.record(number, resp["ETag"])
+        return {"PartNumber": number, "ETag": resp["ETag"]}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, int(max_concurrency))) as pool:
+            completed = list(pool.map(upload_part, parts))
+        resp = s3.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": completed},
+        )
+    except Exception as e:
+        if resumed and _s3_error_code(e) == "NoSuchUpload":
+            # The journaled upload expired or was aborted server-side: start over.
+            journal.discard()
+            return s3_multipart_upload(s3, bucket, key, file_path, mime, part_size, max_concurrency, journal, metadata)
+        if journal is not None:
+            raise  # keep the session for the next attempt
+        try:
+            s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception as abort_error:
+            print(f"[cloud_transfer] Abort multipart upload failed: {abort_error}")
+        raise
+
+    if journal is not None:
+        journal.discard()
+    return resp.get("ETag", "")
+
+
+def s3_stream_upload(s3, bucket, key, write, mime, part_size=16 * MB, max_concurrency=4, metadata=None):
+    """
+    Multipart upload of whatever `write(fileobj)` writes, streamed part by part
+    (size not needed up front). Aborted on failure. Returns the object's ETag.
+    """
+    upload_id = s3.create_multipart_upload(
+        Bucket=bucket, Key=key, ContentType=mime, Metadata=metadata or {},
+    )["UploadId"]
+
+    def upload_part(number, body):
+        if number > S3_MAX_PARTS:
+            raise ValueError(f"s3://{bucket}/{key}: more than {S3_MAX_PARTS} parts, raise part_size")
+        with transfer(len(body)) as t:
+            resp = s3.upload_part(
+                Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=t.body(body),
+                ContentLength=len(body), ContentMD5=content_md5(body),
+            )
+        return {"PartNumber": number, "ETag": resp["ETag"]}
+
+    stream = PartStream(upload_part, max(int(part_size), S3_MIN_PART_SIZE), max_concurrency)
+    try:
+        write(stream)
+        completed = stream.close()
+        resp = s3.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": completed},
+        )
+    except Exception:
+        stream.abort()
+        try:
+            s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception as abort_error:
+            print(f"[cloud_transfer] Abort multipart upload failed: {abort_error}")
+        raise
+    return resp.get("ETag", "")
+
+
+# ---------- Azure ----------
+
+def block_id(number):
+    # All block ids of a blob must have the same length; the SDK base64-encodes them.
+    return f"{number:08d}"
+
+
+def azure_block_upload(blob_client, file_path, mime, block_size=8 * MB, max_concurrency=4, journal=None, metadata=None):
+    """
+    Upload `file_path` as a block blob: blocks are streamed from disk and staged
+    concurrently, then committed in order with a single commit_block_list.
+
+    With a journal, blocks staged by an earlier interrupted call are not re-sent.
+    Returns the blob's ETag.
+    """
+    from azure.storage.blob import BlobBlock, ContentSettings
+
+    size = os.path.getsize(file_path)
+    blocks = plan_parts(size, block_size, max_parts=AZURE_MAX_BLOCKS)
+
+    resumed = journal is not None and journal.load()
+    done = set(journal.parts) if resumed else set()
+    if resumed:
+        print(f"[cloud_transfer] Resuming {blob_client.blob_name}: {len(done)}/{len(blocks)} blocks already staged")
+    elif journal is not None:
+        journal.start()
+
+    def stage(block):
+        number, offset, length = block
+        if number in done:
+            return number
+        with transfer(length) as t:
+            data = read_range(file_path, offset, length)
+            blob_client.stage_block(block_id=block_id(number), data=t.body(data), length=length)
+        if journal is not None:
+            journal.record(number, block_id(number))
+        return number
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, int(max_concurrency))) as pool:
+            list(pool.map(stage, blocks))
+
+        resp = blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id(number)) for number, _, _ in blocks],
+            content_settings=ContentSettings(content_type=mime),
+            metadata=metadata,
+        )
+    except Exception as e:
+        if resumed and getattr(e, "error_code", None) == "InvalidBlockList":
+            # Journaled blocks were garbage-collected server-side: start over.
+            journal.discard()
+            return azure_block_upload(blob_client, file_path, mime, block_size, max_concurrency, journal, metadata)
+        raise
+
+    if journal is not None:
+        journal.discard()
+    return (resp or {}).get("etag", "")
+
+
+def azure_stream_upload(blob_client, write, mime, block_size=8 * MB, max_concurrency=4, metadata=None):
+    """
+    Block blob upload of whatever `write(fileobj)` writes: blocks are staged as
+    they fill up and committed in order at the end. Uncommitted blocks of a
+    failed upload are garbage-collected by the service. Returns the blob's ETag.
+    """
+    from azure.storage.blob import BlobBlock, ContentSettings
+
+    def stage(number, data):
+        if number > AZURE_MAX_BLOCKS:
+            raise ValueError(f"{blob_client.blob_name}: more than {AZURE_MAX_BLOCKS} blocks, raise block_size")
+        with transfer(len(data)) as t:
+            blob_client.stage_block(block_id=block_id(number), data=t.body(data), length=len(data))
+        return number
+
+    stream = PartStream(stage, block_size, max_concurrency)
+    try:
+        write(stream)
+        numbers = stream.close()
+    except Exception:
+        stream.abort()
+        raise
+    resp = blob_client.commit_block_list(
+        [BlobBlock(block_id=block_id(number)) for number in numbers],
+        content_settings=ContentSettings(content_type=mime),
+        metadata=metadata,
+    )
+    return (resp or {}).get("etag", "")
@@ -4,6 +4,8 @@ import base64
 import torch
 import folder_paths
 
+from .file_index import get_index
+
 
 # ------------------------------
 # Decode helpers
@@ -51,10 +53,9 @@ def decode_obj(obj):
 class ConditioningLoadJSONNode:
     @classmethod
     def INPUT_TYPES(cls):
+        # Cached listing, see file_index.py
         cond_dir = os.path.join(folder_paths.output_directory, "conditioning")
-        files = []
-        if os.path.exists(cond_dir):
-            files = [f for f in os.listdir(cond_dir) if f.endswith(".json")]
+        files = get_index(cond_dir, (".json",), recursive=False).files()
 
         return {
             "required": {
@@ -0,0 +1,167 @@
+# file_index.py
+"""
+Cached file lists for the loader nodes' dropdowns (LoadLatent,
+ConditioningLoadJSONNode), whose INPUT_TYPES ComfyUI calls on every node
+list refresh, and cached content fingerprints for their IS_CHANGED.
+
+A directory's mtime changes whenever an entry is added, removed or renamed
+in it, so a refresh stats each known directory and only re-lists (with
+os.scandir, no per-file stat) those whose mtime changed. An output tree of
+hundreds of thousands of images costs one stat per directory instead of a
+full walk. Directories modified within the last couple of seconds are
+re-listed on the next refresh too, in case a change landed within the
+filesystem's mtime granularity.
+
+Directories matching JLNODES_INDEX_PRUNE (comma-separated fnmatch patterns
+against the directory name or its path relative to the root, e.g.
+"frames,renders/*") are not descended into, for image-only subfolders.
+
+file_fingerprint(path) is the file's sha256, recomputed (streamed in chunks)
+only when its (inode, size, mtime_ns) changes, so an unchanged file costs one stat.
+
+Writers that must not expose partial files (latent_writer, LocalBackend) write
+to temp_path(path) and rename it into place; scanners skip those names with
+is_temp_file and, via is_racy, files modified within the racy window (possibly
+still being written in place).
+"""
+import fnmatch
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from .upload_dedup import sha256_file
+
+PRUNE = [p.strip().strip("/") for p in os.getenv("JLNODES_INDEX_PRUNE", "").split(",") if p.strip()]
+
+FINGERPRINT_CACHE_SIZE = 1024
+
+# mtimes this close to the scan time may still change without a visible mtime bump
+_RACY_NS = 2 * 1_000_000_000
+
+_TEMP_NAME = re.compile(r"\.tmp\d+$")
+
+
+def temp_path(path):
+    """Where a writer puts `path` before renaming it into place (matched by is_temp_file)."""
+    return f"{path}.tmp{os.getpid()}"
+
+
+def is_temp_file(name):
+    return _TEMP_NAME.search(name) is not None
+
+
+def is_racy(mtime_ns):
+    """True if a file with this mtime may still be changing (modified within the racy window)."""
+    return time.time_ns() - mtime_ns < _RACY_NS
+
+
+class FileIndex:
+    def __init__(self, root, extensions, recursive=True, prune=None):
+        self.root = os.path.abspath(root)
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.recursive = recursive
+        self.prune = PRUNE if prune is None else list(prune)
+        self._dirs = {}  # relative dir -> (mtime_ns or None, [matching file names], [subdir names])
+        self._lock = threading.Lock()
+
+    def _pruned(self, rel_dir, name):
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_dir, p) for p in self.prune)
+
+    def _list(self, rel_dir, path):
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        if entry.name.lower().endswith(self.extensions):
+                            files.append(entry.name)
+                    elif self.recursive and entry.is_dir():
+                        rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        if not self._pruned(rel, entry.name):
+                            subdirs.append(entry.name)
+                except OSError:
+                    continue  # removed while scanning
+        return files, subdirs
+
+    def files(self):
+        """Sorted paths (relative to the root, os.sep-separated) of the matching files."""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        scan_ns = time.time_ns()
+        dirs = {}
+        found = []
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            path = os.path.join(self.root, *rel_dir.split("/")) if rel_dir else self.root
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+                cached = self._dirs.get(rel_dir)
+                if cached is not None and cached[0] == mtime_ns:
+                    files, subdirs = cached[1], cached[2]
+                else:
+                    files, subdirs = self._list(rel_dir, path)
+            except OSError as e:
+                if rel_dir or not isinstance(e, FileNotFoundError):
+                    print(f"[FileIndex] Error scanning directory {path}: {e}")
+                continue
+
+            racy = scan_ns - mtime_ns < _RACY_NS
+            dirs[rel_dir] = (None if racy else mtime_ns, files, subdirs)
+            prefix = os.path.join(*rel_dir.split("/")) if rel_dir else ""
+            found.extend(os.path.join(prefix, name) if prefix else name for name in files)
+            stack.extend(f"{rel_dir}/{name}" if rel_dir else name for name in subdirs)
+
+        self._dirs = dirs  # drops directories that disappeared
+        return sorted(found)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root, extensions, recursive=True):
+    """The process-wide FileIndex of (root, extensions, recursive)."""
+    key = (os.path.abspath(root), tuple(extensions), recursive)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = FileIndex(root, extensions, recursive)
+        return index
+
+
+_fingerprints = OrderedDict()  # abs path -> ((inode, size, mtime_ns), sha256)
+_fingerprints_lock = threading.Lock()
+
+
+def stat_stamp(path):
+    """
+    ((inode, size, mtime_ns), settled) of `path`. Only settled stamps (mtime not
+    within the racy window, see above) are safe to key a cache on. Raises OSError if missing.
+    """
+    st = os.stat(path)
+    return (st.st_ino, st.st_size, st.st_mtime_ns), not is_racy(st.st_mtime_ns)
+
+
+def file_fingerprint(path):
+    """sha256 of `path`, hashed again only when its stat tuple changed. Raises OSError if missing."""
+    path = os.path.abspath(path)
+    stamp, settled = stat_stamp(path)
+    with _fingerprints_lock:
+        cached = _fingerprints.get(path)
+        if cached is not None and cached[0] == stamp:
+            _fingerprints.move_to_end(path)
+            return cached[1]
+
+    digest = sha256_file(path)
+    if settled:
+        with _fingerprints_lock:
+            _fingerprints[path] = (stamp, digest)
+            _fingerprints.move_to_end(path)
+            while len(_fingerprints) > FINGERPRINT_CACHE_SIZE:
+                _fingerprints.popitem(last=False)
+    return digest
@@ -0,0 +1,79 @@
+# image_archive.py
+"""
+Write encoded frames into a tar or zip archive on a non-seekable stream
+(the upload's PartStream, see cloud_transfer.py), so an archive of any size
+is uploaded while it is being written and never exists as a whole.
+
+  tar  ustar/pax stream ("w|"), 512-byte aligned members
+  zip  stored (frames are already compressed), sizes in data descriptors,
+       zip64 when needed
+"""
+import io
+import os
+import tarfile
+import time
+import zipfile
+
+# format -> (mime, extension)
+ARCHIVE_FORMATS = {
+    "tar": ("application/x-tar", "tar"),
+    "zip": ("application/zip", "zip"),
+}
+ARCHIVE_MODES = ["none"] + list(ARCHIVE_FORMATS)
+
+_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+class _CountingWriter:
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.size = 0
+
+    def write(self, data):
+        self._fileobj.write(data)
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def archive_key_template(template, archive_format):
+    """The object key template of the archive: {ext} or a trailing image extension becomes .tar / .zip."""
+    ext = ARCHIVE_FORMATS[archive_format][1]
+    template = template.replace("{ext}", ext)
+    root, old_ext = os.path.splitext(template)
+    if old_ext.lower() == "." + ext:
+        return template
+    if old_ext.lower() in _IMAGE_EXTENSIONS:
+        template = root
+    return f"{template}.{ext}"
+
+
+def write_archive(fileobj, archive_format, members, mtime=None):
+    """
+    Write `members` ((name, bytes) pairs, in order) as an `archive_format`
+    archive to `fileobj`, which only needs write(). Returns the archive size in bytes.
+    """
+    out = _CountingWriter(fileobj)
+    mtime = int(time.time() if mtime is None else mtime)
+
+    if archive_format == "tar":
+        with tarfile.open(fileobj=out, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = mtime
+                info.mode = 0o644
+                tar.addfile(info, io.BytesIO(data))
+    elif archive_format == "zip":
+        date_time = time.localtime(mtime)[:6]
+        with zipfile.ZipFile(out, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for name, data in members:
+                info = zipfile.ZipInfo(name, date_time=date_time)
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, data)
+    else:
+        raise ValueError(f"Unknown archive format: {archive_format}")
+    return out.size
+
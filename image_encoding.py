@@ -0,0 +1,83 @@
+# image_encoding.py
+"""
+IMAGE tensor -> encoded bytes helpers shared by the image upload nodes.
+
+PIL releases the GIL while compressing, so frames of a batch can be encoded
+in parallel on a thread pool.
+
+Formats trade encode time against upload size:
+  png            lossless, compress_level 0 (fastest) .. 9 (smallest), PIL default 6
+  jpeg           lossy, `quality`
+  webp           lossy, `quality`
+  webp_lossless  lossless, `quality` is the compression effort
+"""
+import io
+import os
+
+# format -> (PIL format, mime, extension)
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png", "png"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "webp_lossless": ("WEBP", "image/webp", "webp"),
+}
+DEFAULT_MIME = "image/png"
+
+
+def encode_image(frame, image_format="png", quality=90, compress_level=6):
+    """Encode a single [H, W, C] float frame (0..1) in `image_format`."""
+    from PIL import Image
+    import numpy as np
+
+    pil_format = IMAGE_FORMATS[image_format][0]
+    arr = frame.cpu().numpy()
+    arr = (np.clip(arr, 0, 1) * 255).astype("uint8")
+    pil = Image.fromarray(arr)
+
+    buf = io.BytesIO()
+    if image_format == "png":
+        pil.save(buf, format=pil_format, compress_level=int(compress_level))
+    elif image_format == "jpeg":
+        if pil.mode != "RGB":
+            pil = pil.convert("RGB")  # JPEG has no alpha
+        pil.save(buf, format=pil_format, quality=int(quality))
+    elif image_format == "webp_lossless":
+        pil.save(buf, format=pil_format, lossless=True, quality=int(quality), method=4)
+    else:
+        pil.save(buf, format=pil_format, quality=int(quality), method=4)
+    return buf.getvalue()
+
+
+def resolve_format(image_format, template, mime):
+    """
+    Return (template, mime) for `image_format`: a {ext} placeholder or a trailing
+    .png in the template gets the format's extension, and the mime is derived
+    unless the node's mime field was changed from the PNG default.
+    """
+    _, format_mime, ext = IMAGE_FORMATS[image_format]
+    template = template.replace("{ext}", ext)
+    root, old_ext = os.path.splitext(template)
+    if old_ext.lower() == ".png" and ext != "png":
+        template = f"{root}.{ext}"
+    if not (mime or "").strip() or mime == DEFAULT_MIME:
+        mime = format_mime
+    return template, mime
+
+
+def batch_indices(image, batch_mode=True):
+    """Frame indices of an IMAGE batch to upload (only the first one if batch_mode is off)."""
+    if not batch_mode:
+        return [0]
+    return list(range(int(image.shape[0])))
+
+
+def indexed_template(template, count):
+    """
+    Make sure keys of a multi-frame batch don't collide within one {timestamp}:
+    if the template has no {index} (or content-addressed {sha256}) placeholder,
+    append `_{index}` before the extension.
+    """
+    if count <= 1 or "{index}" in template or "{sha256}" in template:
+        return template
+    root, ext = os.path.splitext(template)
+    return f"{root}_{{index}}{ext}"
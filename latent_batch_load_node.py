@@ -0,0 +1,140 @@
+import fnmatch
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import safetensors
+import folder_paths
+import torch
+
+from .file_index import get_index, stat_stamp
+
+# safetensors header dtype -> torch dtype
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+}
+
+
+def match_latents(pattern, max_count=0):
+    """
+    .latent paths (relative to the output directory, sorted) matching `pattern`:
+    a glob when it contains * ? or [ ("latents/run_*.latent", * also crosses folders),
+    a path prefix otherwise ("latents/run_"); empty = all.
+    """
+    pattern = pattern.strip().replace("\\", "/")
+    files = get_index(folder_paths.get_output_directory(), (".latent",)).files()
+    is_glob = any(c in pattern for c in "*?[")
+    matched = []
+    for rel in files:
+        posix = rel.replace(os.sep, "/")
+        if not pattern or (fnmatch.fnmatchcase(posix, pattern) if is_glob else posix.startswith(pattern)):
+            matched.append(rel)
+            if max_count and len(matched) >= max_count:
+                break
+    return matched
+
+
+def _header(path):
+    # Shape / dtype / format version from the safetensors header, without reading the tensor
+    with safetensors.safe_open(path, framework="pt", device="cpu") as f:
+        info = f.get_slice("latent_tensor")
+        dtype = info.get_dtype()
+        if dtype not in _DTYPES:
+            raise ValueError(f"{path}: unsupported latent dtype {dtype}")
+        return list(info.get_shape()), _DTYPES[dtype], "latent_format_version_0" not in f.keys()
+
+
+class LoadLatentBatch:
+    """
+    Load every .latent file under ComfyUI's output directory matching `pattern`
+    (glob or prefix, see match_latents) into one batch, in path order, at most
+    `max_count` files (0 = all).
+
+    Headers are read first to validate that all latents have the same shape
+    (apart from their batch size) and to allocate the batch once; the files are
+    then read on `max_workers` threads, each copied straight into its slice of
+    the batch (no list + torch.cat). Legacy-format files are scaled like LoadLatent;
+    with `keep_dtype` the batch keeps the files' dtype instead of float32.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "pattern": ("STRING", {"default": "latents/*.latent"}),
+            },
+            "optional": {
+                "max_count": ("INT", {"default": 0, "min": 0, "max": 100000}),
+                "max_workers": ("INT", {"default": 4, "min": 1, "max": 32}),
+                "keep_dtype": ("BOOLEAN", {"default": False}),
+            },
+        }
+
+    CATEGORY = "JLNodes/latent"
+    RETURN_TYPES = ("LATENT", "STRING")
+    RETURN_NAMES = ("latent", "files")
+    FUNCTION = "load_batch"
+
+    def load_batch(self, pattern, max_count=0, max_workers=4, keep_dtype=False):
+        files = match_latents(pattern, max_count)
+        if not files:
+            raise ValueError(f"No .latent files match '{pattern}'")
+        output_dir = folder_paths.get_output_directory()
+        paths = [os.path.join(output_dir, rel) for rel in files]
+        workers = max(1, min(int(max_workers), len(paths)))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            headers = list(pool.map(_header, paths))
+
+            shape = headers[0][0]
+            for rel, (other, _, _) in zip(files, headers):
+                if len(other) != len(shape) or other[1:] != shape[1:]:
+                    raise ValueError(f"Latent shape mismatch: {files[0]} is {shape}, {rel} is {other}")
+
+            dtype = torch.float32
+            if keep_dtype:
+                dtype = headers[0][1]
+                for _, other, _ in headers[1:]:
+                    dtype = torch.promote_types(dtype, other)
+
+            offsets = [0]
+            for other, _, _ in headers:
+                offsets.append(offsets[-1] + other[0])
+            batch = torch.empty([offsets[-1]] + shape[1:], dtype=dtype)
+
+            def read(i):
+                with safetensors.safe_open(paths[i], framework="pt", device="cpu") as f:
+                    tensor = f.get_tensor("latent_tensor")
+                target = batch[offsets[i]:offsets[i + 1]]
+                target.copy_(tensor)
+                if headers[i][2]:
+                    target.mul_(1.0 / 0.18215)
+
+            list(pool.map(read, range(len(paths))))
+
+        print(f"[LoadLatentBatch] Loaded {len(files)} latent(s) matching '{pattern}' -> {list(batch.shape)} {dtype}")
+        return ({"samples": batch}, "\n".join(files))
+
+    @classmethod
+    def IS_CHANGED(cls, pattern, max_count=0, **kwargs):
+        # The matched files and their stat stamps: no file contents are read
+        output_dir = folder_paths.get_output_directory()
+        stamps = []
+        for rel in match_latents(pattern, max_count):
+            try:
+                stamps.append([rel, list(stat_stamp(os.path.join(output_dir, rel))[0])])
+            except OSError:
+                stamps.append([rel, None])
+        return json.dumps(stamps)
+
+
+NODE_CLASS_MAPPINGS = {
+    "JLLoadLatentBatch": LoadLatentBatch
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "JLLoadLatentBatch": "Load Latent Batch"
+}
@@ -0,0 +1,129 @@
+# latent_cache.py
+"""
+Process-wide LRU cache of decoded latents for LoadLatent.
+
+Entries are keyed on the file's path and the decoding variant (LoadLatent's
+load mode / keep_dtype), so the variants of one file are cached side by side,
+and hold the file's stat stamp (inode, size, mtime_ns, see
+file_index.stat_stamp): a rewritten file is a miss and every variant of it is
+dropped. The cache holds at most JLNODES_LATENT_CACHE_MB of tensor
+data (0 disables it) and evicts least recently used entries by size; a
+latent bigger than the whole budget is not cached.
+
+Callers always get their own copy (a clone of the cached tensor), so
+in-place ops downstream can't corrupt the cache. A clone is a memcpy, far
+cheaper than reading and decoding the file again.
+
+cache_stats() reports hits / misses / evictions and current usage
+(shown by LatentStatusNode).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .file_index import stat_stamp
+
+BUDGET_BYTES = int(float(os.getenv("JLNODES_LATENT_CACHE_MB", "512")) * 1024 * 1024)
+
+
+def _nbytes(tensor):
+    return tensor.element_size() * tensor.nelement()
+
+
+class LatentCache:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = max(0, int(budget_bytes))
+        self._entries = OrderedDict()  # (path, variant) -> (stamp, tensor, nbytes)
+        self._variants = {}  # path -> set of cached variants
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+
+    def _drop(self, key):
+        # Caller holds _lock.
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+        path, variant = key
+        variants = self._variants[path]
+        variants.discard(variant)
+        if not variants:
+            del self._variants[path]
+
+    def _drop_path(self, path):
+        # Caller holds _lock. Returns the number of entries dropped.
+        variants = list(self._variants.get(path, ()))
+        for variant in variants:
+            self._drop((path, variant))
+        return len(variants)
+
+    def invalidate(self, path):
+        """Drop every cached variant of `path`."""
+        with self._lock:
+            self._drop_path(os.path.abspath(path))
+
+    def get_or_load(self, path, load, variant=""):
+        """
+        A private copy of the tensor `load(path)` returns, from the cache when
+        the file is unchanged. `variant` distinguishes different decodings of one file.
+        """
+        path = os.path.abspath(path)
+        if not self.budget_bytes:
+            return load(path)
+
+        stamp, settled = stat_stamp(path)
+        key = (path, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1].clone()
+            self.misses += 1
+            if any(self._entries[(path, v)][0] != stamp for v in self._variants.get(path, ())):
+                # The file changed: all its variants are stale
+                self.stale += self._drop_path(path)
+
+        tensor = load(path)
+        nbytes = _nbytes(tensor)
+        # Files written just now may change again without a visible mtime bump
+        if not settled or nbytes > self.budget_bytes:
+            return tensor
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (stamp, tensor, nbytes)
+            self._variants.setdefault(path, set()).add(variant)
+            self._bytes += nbytes
+            while self._bytes > self.budget_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return tensor.clone()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._variants.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale": self.stale,
+            }
+
+
+LATENT_CACHE = LatentCache(BUDGET_BYTES)
+
+
+def cache_stats():
+    return LATENT_CACHE.stats()
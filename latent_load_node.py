@@ -1,47 +1,66 @@
 import os
-import hashlib
+import safetensors
 import safetensors.torch
 import folder_paths
 import torch
 
+from .file_index import file_fingerprint, get_index
+from .latent_cache import LATENT_CACHE
+
+
+LOAD_MODES = ["standard", "mmap"]
+
+
+def _read_latent(latent_path, load_mode="standard", keep_dtype=False):
+    if load_mode == "mmap":
+        # safe_open maps the file and copies only the tensor that is asked for
+        with safetensors.safe_open(latent_path, framework="pt", device="cpu") as f:
+            legacy = "latent_format_version_0" not in f.keys()
+            tensor = f.get_tensor("latent_tensor")
+        if not keep_dtype:
+            tensor = tensor.float()  # no-op for float32
+        if legacy:
+            tensor.mul_(1.0 / 0.18215)  # owned by us: scale in place
+        return tensor
+
+    # Load the latent file
+    latent = safetensors.torch.load_file(latent_path, device="cpu")
+
+    tensor = latent["latent_tensor"]
+    if not keep_dtype:
+        tensor = tensor.float()
+
+    # Apply the correct multiplier based on format version (current format: none)
+    if "latent_format_version_0" not in latent:
+        tensor = tensor * (1.0 / 0.18215)
+    return tensor
+
+
 class LoadLatent:
     """
     Loads latent tensors directly from ComfyUI's output directory.
     This node uses code copied from DJZ-Nodes. All credit belongs to DJZ-Nodes.
+
+    `load_mode` mmap reads the tensor through safetensors.safe_open (memory-mapped,
+    one copy of the tensor instead of up to three) and skips the scale for current-format
+    files. With `keep_dtype` (either mode) fp16/bf16 latents are not upcast to float32.
     """
     @classmethod
     def INPUT_TYPES(s):
-        # Get the output directory
-        output_dir = folder_paths.get_output_directory()
-        
-        # Scan for .latent files in outputs
-        latents = []
-        
-        def scan_folder(folder, relative_path=""):
-            try:
-                for item in os.listdir(folder):
-                    full_path = os.path.join(folder, item)
-                    rel_path = os.path.join(relative_path, item)
-                    
-                    if os.path.isfile(full_path) and item.endswith(".latent"):
-                        # Store relative path for cleaner display
-                        latents.append(rel_path)
-                    elif os.path.isdir(full_path):
-                        # Recursively scan subdirectories
-                        scan_folder(full_path, rel_path)
-            except Exception as e:
-                print(f"Error scanning directory {folder}: {str(e)}")
-        
-        # Start scan from output directory
-        scan_folder(output_dir)
-        
+        # Cached scan of the output directory, see file_index.py
+        latents = get_index(folder_paths.get_output_directory(), (".latent",)).files()
+
         # If no latents found, provide an empty option
         if not latents:
             latents = [""]
             
         return {
             "required": {
-                "latent_file": (sorted(latents),),
+                "latent_file": (latents,),
+            },
+            "optional": {
+                "load_mode": (LOAD_MODES, {"default": "standard"}),
+                "keep_dtype": ("BOOLEAN", {"default": False}),
             },
         }
 
@@ -49,7 +68,7 @@ class LoadLatent:
     RETURN_TYPES = ("LATENT",)
     FUNCTION = "load_latent"
 
-    def load_latent(self, latent_file):
+    def load_latent(self, latent_file, load_mode="standard", keep_dtype=False):
         if not latent_file:
             raise ValueError("No latent file selected")
         
@@ -58,15 +77,13 @@ class LoadLatent:
         latent_path = os.path.join(output_dir, latent_file)
         
         try:
-            # Load the latent file
-            latent = safetensors.torch.load_file(latent_path, device="cpu")
-            
-            # Apply the correct multiplier based on format version
-            multiplier = 1.0 if "latent_format_version_0" in latent else 1.0 / 0.18215
-            
-            # Return the properly formatted samples
+            # Decoded latents are cached in memory (LRU, byte budget), see latent_cache.py
             samples = {
-                "samples": latent["latent_tensor"].float() * multiplier
+                "samples": LATENT_CACHE.get_or_load(
+                    latent_path,
+                    lambda path: _read_latent(path, load_mode, keep_dtype),
+                    variant=f"{load_mode}:{keep_dtype}",
+                )
             }
             
             return (samples,)
@@ -76,7 +93,7 @@ class LoadLatent:
             return ({"samples": torch.zeros((1, 4, 8, 8))},)
 
     @classmethod
-    def IS_CHANGED(s, latent_file):
+    def IS_CHANGED(s, latent_file, **kwargs):
         if not latent_file:
             return "NO_FILE_SELECTED"
             
@@ -84,15 +101,13 @@ class LoadLatent:
         latent_path = os.path.join(output_dir, latent_file)
         
         try:
-            m = hashlib.sha256()
-            with open(latent_path, 'rb') as f:
-                m.update(f.read())
-            return m.digest().hex()
+            # Cached by (inode, size, mtime): unchanged files cost one stat
+            return file_fingerprint(latent_path)
         except Exception:
             return "ERROR_READING_FILE"
 
     @classmethod
-    def VALIDATE_INPUTS(s, latent_file):
+    def VALIDATE_INPUTS(s, latent_file, **kwargs):
         if not latent_file:
             return "No latent file selected"
             
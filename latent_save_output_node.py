@@ -5,8 +5,17 @@ import comfy.utils
 import folder_paths
 from comfy.cli_args import args
 
+from .latent_writer import is_pending, snapshot, write_async
+
 
 class SaveAndOutputLatent:
+    """
+    Save a latent to the output directory and pass it through.
+
+    With `async_write` the latent is snapshotted (copied off the GPU / cloned)
+    and written by a background thread (temp file + rename, see latent_writer.py),
+    so downstream nodes don't wait for the disk.
+    """
     def __init__(self):
         self.output_dir = folder_paths.get_output_directory()
 
@@ -17,6 +26,9 @@ class SaveAndOutputLatent:
                 "samples": ("LATENT",),
                 "filename_prefix": ("STRING", {"default": "latents/ComfyUI"}),
             },
+            "optional": {
+                "async_write": ("BOOLEAN", {"default": False}),
+            },
             "hidden": {
                 "prompt": "PROMPT",
                 "extra_pnginfo": "EXTRA_PNGINFO",
@@ -31,7 +43,7 @@ class SaveAndOutputLatent:
     OUTPUT_NODE = True
     CATEGORY = "JLNodes/latent"
 
-    def save(self, samples, filename_prefix="ComfyUI", prompt=None, extra_pnginfo=None):
+    def save(self, samples, filename_prefix="ComfyUI", async_write=False, prompt=None, extra_pnginfo=None):
         # Resolve output path
         full_output_folder, filename, counter, subfolder, filename_prefix = \
             folder_paths.get_save_image_path(
@@ -53,14 +65,26 @@ class SaveAndOutputLatent:
         # ---- filename ----
         latent_filename = f"{filename}_{counter:05}_.latent"
         latent_path = os.path.join(full_output_folder, latent_filename)
+        # The counter comes from the files on disk: skip names of async writes still pending
+        while is_pending(latent_path) or (async_write and os.path.exists(latent_path)):
+            counter += 1
+            latent_filename = f"{filename}_{counter:05}_.latent"
+            latent_path = os.path.join(full_output_folder, latent_filename)
 
         # ---- save latent ----
-        output = {
-            "latent_tensor": samples["samples"].contiguous(),
-            "latent_format_version_0": torch.tensor([]),
-        }
+        if async_write:
+            output = {
+                "latent_tensor": snapshot(samples["samples"]),
+                "latent_format_version_0": torch.tensor([]),
+            }
+            write_async(comfy.utils.save_torch_file, output, latent_path, metadata=metadata)
+        else:
+            output = {
+                "latent_tensor": samples["samples"].contiguous(),
+                "latent_format_version_0": torch.tensor([]),
+            }
 
-        comfy.utils.save_torch_file(output, latent_path, metadata=metadata)
+            comfy.utils.save_torch_file(output, latent_path, metadata=metadata)
 
         # ---- UI result ----
         ui_results = [{
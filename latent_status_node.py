@@ -0,0 +1,50 @@
+# latent_status_node.py
+import json
+
+from .latent_cache import LATENT_CACHE, cache_stats
+from .latent_writer import writer_status
+
+
+class LatentStatusNode:
+    """
+    Report LoadLatent's in-memory cache (latent_cache.py): entries, bytes used
+    against the budget, hits / misses / evictions / stale entries, and
+    SaveAndOutputLatent's async writes (latent_writer.py): pending, written, failed.
+    Set `clear_cache` to drop every cached latent.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {},
+            "optional": {
+                "clear_cache": ("BOOLEAN", {"default": False}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("status",)
+    FUNCTION = "status"
+    OUTPUT_NODE = True
+    CATEGORY = "JLNodes/latent"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Always re-run: the counters change between prompts
+        return float("nan")
+
+    def status(self, clear_cache=False):
+        if clear_cache:
+            LATENT_CACHE.clear()
+            print("[LatentStatusNode] Cleared the latent cache")
+
+        status = {"latent_cache": cache_stats(), "latent_writes": writer_status()}
+        text = json.dumps(status, indent=2)
+        return {
+            "ui": {"text": [text]},
+            "result": (text,),
+        }
+
+
+NODE_CLASS_MAPPINGS = {"LatentStatusNode": LatentStatusNode}
+NODE_DISPLAY_NAME_MAPPINGS = {"LatentStatusNode": "Latent Status"}
@@ -0,0 +1,123 @@
+# latent_writer.py
+"""
+Background writer for SaveAndOutputLatent's async_write mode.
+
+The node hands over a snapshot of the latent and returns; one writer thread
+saves it to "<path>.tmp<pid>" (file_index.temp_path) and renames it into place,
+so readers (LoadLatent, the output sync, which skips those names) never see a
+partial .latent file.
+
+The queue holds at most JLNODES_LATENT_WRITE_QUEUE writes (default 4) besides
+the one being written; when the disk can't keep up, the next save blocks until a slot frees up
+instead of piling snapshots up in memory. Pending writes are flushed at exit.
+"""
+import atexit
+import os
+import queue
+import threading
+
+from .file_index import temp_path
+
+MAX_PENDING = max(1, int(os.getenv("JLNODES_LATENT_WRITE_QUEUE", "4")))
+
+_queue = queue.Queue(maxsize=MAX_PENDING)
+_worker = None
+_worker_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_pending_paths = set()  # queued or being written, not on disk yet
+_written = 0
+_failed = 0
+
+
+def snapshot(tensor):
+    """
+    A CPU, contiguous tensor that later in-place ops on `tensor` can't change.
+    Moving off the GPU or making it contiguous already copies; only a CPU
+    contiguous tensor is cloned.
+    """
+    tensor = tensor.detach()
+    snap = tensor.to("cpu").contiguous()
+    if snap.data_ptr() == tensor.data_ptr():
+        snap = snap.clone()
+    return snap
+
+
+def _write(save, tensors, path, metadata):
+    tmp = temp_path(path)
+    try:
+        save(tensors, tmp, metadata=metadata)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_async(save, tensors, path, metadata=None):
+    """
+    Queue `save(tensors, path, metadata=metadata)` (e.g. comfy.utils.save_torch_file)
+    for the writer thread. Blocks while MAX_PENDING writes are queued.
+    `tensors` must not be modified afterwards (see snapshot()).
+    """
+    _ensure_worker()
+    with _stats_lock:
+        _pending_paths.add(os.path.abspath(path))
+    _queue.put((save, tensors, path, metadata))
+
+
+def is_pending(path):
+    """True while a write to `path` is queued or in progress (the file may not exist yet)."""
+    with _stats_lock:
+        return os.path.abspath(path) in _pending_paths
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="jlnodes-latent-writer", daemon=True)
+            _worker.start()
+
+
+def _run():
+    global _written, _failed
+    while True:
+        save, tensors, path, metadata = _queue.get()
+        try:
+            _write(save, tensors, path, metadata)
+            with _stats_lock:
+                _written += 1
+        except Exception as e:
+            print(f"[SaveAndOutputLatent] Async write of {path} failed: {e}")
+            with _stats_lock:
+                _failed += 1
+        finally:
+            with _stats_lock:
+                _pending_paths.discard(os.path.abspath(path))
+            _queue.task_done()
+
+
+def flush(timeout=None):
+    """Wait for pending writes to reach the disk. Returns True if the queue drained."""
+    if _worker is None:
+        return True
+    if timeout is None:
+        _queue.join()
+        return True
+    with _queue.all_tasks_done:
+        return _queue.all_tasks_done.wait_for(lambda: not _queue.unfinished_tasks, timeout)
+
+
+def writer_status():
+    with _stats_lock:
+        return {"pending": _queue.unfinished_tasks, "max_pending": MAX_PENDING, "written": _written, "failed": _failed}
+
+
+@atexit.register
+def _flush_at_exit():
+    pending = _queue.unfinished_tasks
+    if pending:
+        print(f"[SaveAndOutputLatent] Flushing {pending} pending latent write(s)")
+        flush()
@@ -0,0 +1,102 @@
+# multi_upload_image_node.py
+import json
+
+from .callbacks import CALLBACK_MODES, DEFAULT_MODE as DEFAULT_CALLBACK_MODE
+from .image_encoding import IMAGE_FORMATS
+from .upload_backends import AzureBackend, S3Backend, local_override
+from .upload_metrics import ENABLED as METRICS_ENABLED, start_metrics
+from .upload_pipeline import upload_image_fanout
+
+
+class MultiUploadImageNode:
+    """
+    Upload an IMAGE tensor to S3 and Azure Blob at once: every frame is
+    converted and encoded once, then uploaded to all configured destinations
+    concurrently (instead of chaining S3ImageNode and AzureImageNode, which
+    encodes the batch twice and uploads serially).
+
+    A destination is skipped when its bucket / container is empty. A failing
+    destination does not fail the node: the `status` output is a JSON object
+    {"s3": {"status": "ok" | "error" | "skipped", "urls": [...], "errors": [...]}, "azure": {...}}
+    and the failed destination's url is empty.
+
+    Azure credentials follow the Azure upload nodes (fields or .env).
+    `key_template` supports {timestamp}, {index} and {sha256} and is used for both
+    destinations; with a callback_url each uploaded frame posts one callback per destination.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": ("IMAGE",),
+                "key_template": ("STRING", {"default": "comfy/{timestamp}.png"}),
+                "mime": ("STRING", {"default": "image/png"}),
+                "use_signed_url": ("BOOLEAN", {"default": False}),
+                "signed_expires": ("INT", {"default": 3600, "min": 60, "max": 604800}),
+                "callback_url": ("STRING", {"default": ""}),
+
+                # S3 (leave bucket blank to skip)
+                "s3_bucket": ("STRING", {"default": ""}),
+                "s3_region": ("STRING", {"default": ""}),
+
+                # Azure (leave container blank to skip; auth blank = .env)
+                "azure_container": ("STRING", {"default": ""}),
+                "connection_string": ("STRING", {"default": "", "multiline": True}),
+                "account_name": ("STRING", {"default": ""}),
+                "account_key": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                "batch_mode": ("BOOLEAN", {"default": True}),
+                "max_workers": ("INT", {"default": 4, "min": 1, "max": 32}),
+                # Encoder: png (compress_level 0-9), jpeg / webp (quality), webp_lossless
+                "image_format": (list(IMAGE_FORMATS), {"default": "png"}),
+                "quality": ("INT", {"default": 90, "min": 1, "max": 100}),
+                "compress_level": ("INT", {"default": 6, "min": 0, "max": 9}),
+                "dedup": ("BOOLEAN", {"default": False}),
+                # sync | async (fire-and-forget) | async_batched (coalesced {"events": [...]} POSTs)
+                "callback_mode": (CALLBACK_MODES, {"default": DEFAULT_CALLBACK_MODE}),
+                # Per-stage timings/bytes on the `metrics` output (+ Prometheus file, see upload_metrics.py)
+                "collect_metrics": ("BOOLEAN", {"default": METRICS_ENABLED}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("image", "s3_url", "azure_url", "status", "metrics")
+    FUNCTION = "upload"
+    CATEGORY = "JLNodes/cloud"
+
+    def upload(self, image, key_template, mime, use_signed_url, signed_expires, callback_url,
+               s3_bucket, s3_region, azure_container, connection_string, account_name, account_key,
+               batch_mode=True, max_workers=4, image_format="png", quality=90, compress_level=6,
+               dedup=False, callback_mode=DEFAULT_CALLBACK_MODE, collect_metrics=METRICS_ENABLED):
+        metrics = start_metrics("MultiUploadImageNode", collect_metrics)
+        backends = {}
+        bucket = s3_bucket.strip()
+        if bucket:
+            backends["s3"] = local_override(bucket) or S3Backend(bucket, s3_region)
+        container = azure_container.strip()
+        if container:
+            backends["azure"] = local_override(container) or AzureBackend(container, connection_string, account_name, account_key)
+        if not backends:
+            raise ValueError("Set s3_bucket and/or azure_container")
+
+        results = upload_image_fanout(
+            backends, image, key_template, mime,
+            use_signed_url=use_signed_url, signed_expires=signed_expires,
+            batch_mode=batch_mode, max_workers=max_workers,
+            image_format=image_format, quality=quality, compress_level=compress_level,
+            dedup=dedup, callback_url=callback_url, callback_mode=callback_mode,
+            source="MultiUploadImageNode", metrics=metrics,
+        )
+        status = {name: results.get(name, {"status": "skipped", "urls": [], "errors": []}) for name in ("s3", "azure")}
+        print("[MultiUploadImageNode] " + ", ".join(f"{name}: {r['status']}" for name, r in status.items()))
+
+        def joined(name):
+            return "\n".join(u for u in status[name]["urls"] if u)
+
+        return (image, joined("s3"), joined("azure"), json.dumps(status), metrics.finish())
+
+
+NODE_CLASS_MAPPINGS = {"MultiUploadImageNode": MultiUploadImageNode}
+NODE_DISPLAY_NAME_MAPPINGS = {"MultiUploadImageNode": "Multi Upload (Image, S3 + Azure)"}
@@ -0,0 +1,159 @@
+# output_sync.py
+"""
+Incremental directory -> bucket sync (used by OutputSyncNode).
+
+A local manifest remembers, per synced file, (size, mtime_ns, etag, key) of
+the last upload. A run walks the directory with os.scandir (one stat per
+file, no reads), uploads only files that are new or whose size/mtime changed,
+in parallel, and, with `delete_remote`, deletes the objects of manifest
+entries whose local file is gone. Nothing is listed remotely, so the cost is
+one stat per local file plus the change set.
+
+Manifests live in <state dir>/sync/, one per (backend, prefix, local root).
+Hidden files and directories (".name") are skipped, and so are writers' temp
+files ("name.tmp<pid>", see file_index.temp_path). Files modified within the
+last couple of seconds may still be being written: they are left for the next
+run (reported as `deferred`).
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .file_index import is_racy, is_temp_file, temp_path
+from .upload_journal import STATE_DIR
+
+SYNC_DIR = os.path.join(STATE_DIR, "sync")
+
+
+def scan_tree(root):
+    """Yield (relative posix path, size, mtime_ns) of every regular file under `root`."""
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            it = os.scandir(os.path.join(root, rel_dir))
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                if entry.name.startswith(".") or is_temp_file(entry.name):
+                    continue
+                rel = posixpath.join(rel_dir, entry.name) if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(rel)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        yield rel, st.st_size, st.st_mtime_ns
+                except FileNotFoundError:
+                    continue  # removed while scanning
+
+
+class SyncManifest:
+    def __init__(self, backend, prefix, root):
+        ident = json.dumps([backend.to_params(), prefix, os.path.abspath(root)], sort_keys=True)
+        self.path = os.path.join(SYNC_DIR, hashlib.sha256(ident.encode("utf-8")).hexdigest()[:32] + ".json")
+        self.files = {}  # rel path -> {"size", "mtime_ns", "etag", "key"}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def save(self):
+        os.makedirs(SYNC_DIR, exist_ok=True)
+        tmp = temp_path(self.path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp, self.path)
+
+
+def _key(prefix, rel):
+    prefix = prefix.strip("/")
+    return f"{prefix}/{rel}" if prefix else rel
+
+
+def sync_directory(backend, root, prefix="", extensions=(), delete_remote=False, max_workers=8,
+                   dry_run=False, transfer=None, source="OutputSyncNode"):
+    """
+    Upload new/changed files under `root` to `prefix` and return a report:
+    {"uploaded": [...], "deleted": [...], "failed": [...], "deferred": [...], "unchanged": n, "scanned": n, ...}.
+    Failed and deferred (still being written) files are reported, not raised, and retried on the next run.
+    """
+    start = time.monotonic()
+    exts = tuple(e.lower() for e in extensions)
+    manifest = SyncManifest(backend, prefix, root)
+    old = manifest.files
+
+    present = {}
+    changed = []
+    deferred = []
+    for rel, size, mtime_ns in scan_tree(root):
+        present[rel] = (size, mtime_ns)
+        if exts and not rel.lower().endswith(exts):
+            continue
+        entry = old.get(rel)
+        if entry is None or entry["size"] != size or entry["mtime_ns"] != mtime_ns:
+            # Possibly still being written in place: upload it once it settled
+            (deferred if is_racy(mtime_ns) else changed).append(rel)
+    changed_set = set(changed) | set(deferred)
+    unchanged = sum(1 for rel in present if rel in old and rel not in changed_set)
+    gone = [rel for rel in old if rel not in present]
+
+    report = {
+        "root": root, "prefix": prefix, "provider": backend.provider, "dry_run": dry_run,
+        "scanned": len(present), "unchanged": unchanged,
+        "uploaded": [], "deleted": [], "failed": [], "deferred": deferred,
+    }
+    lock = threading.Lock()
+
+    def upload(rel):
+        size, mtime_ns = present[rel]
+        key = _key(prefix, rel)
+        mime = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        etag = backend.put_file(key, os.path.join(root, rel), mime, None, **(transfer or {}))
+        with lock:
+            old[rel] = {"size": size, "mtime_ns": mtime_ns, "etag": etag, "key": key}
+        return {"path": rel, "key": key, "url": backend.url(key), "size_bytes": size, "mime": mime}
+
+    def delete(rel):
+        key = old[rel]["key"]
+        backend.delete(key)
+        with lock:
+            old.pop(rel, None)
+        return key
+
+    jobs = [(upload, rel) for rel in changed]
+    if delete_remote:
+        jobs += [(delete, rel) for rel in gone]
+    else:
+        for rel in gone:
+            old.pop(rel, None)  # forget it, keep the remote object
+
+    try:
+        if dry_run:
+            report["uploaded"] = [{"path": rel, "key": _key(prefix, rel)} for rel in changed]
+            report["deleted"] = [old[rel]["key"] for rel in gone] if delete_remote else []
+        elif jobs:
+            with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(jobs)))) as pool:
+                futures = {pool.submit(fn, rel): (fn, rel) for fn, rel in jobs}
+                for future in as_completed(futures):
+                    fn, rel = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"[{source}] Failed to {fn.__name__} {rel}: {e}")
+                        report["failed"].append({"path": rel, "action": fn.__name__, "error": str(e)})
+                        continue
+                    report["uploaded" if fn is upload else "deleted"].append(result)
+    finally:
+        if not dry_run and (jobs or gone):
+            manifest.save()
+
+    report["seconds"] = round(time.monotonic() - start, 3)
+    return report
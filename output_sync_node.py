@@ -0,0 +1,110 @@
+# output_sync_node.py
+import json
+import os
+
+from .callbacks import CALLBACK_MODES, DEFAULT_MODE as DEFAULT_CALLBACK_MODE, send_callback
+from .output_sync import sync_directory
+from .upload_backends import AzureBackend, S3Backend, local_override
+from .upload_pipeline import transfer_options
+
+
+class OutputSyncNode:
+    """
+    Sync ComfyUI's output directory (or a subfolder of it) to S3 / Azure Blob,
+    rsync-style: only files that are new or changed since the last sync are
+    uploaded (in parallel), so latents, conditioning JSON, VHS frames etc.
+    saved by any node reach storage without wiring an upload node to each.
+
+    Changes are detected with a local manifest of (path, size, mtime, etag),
+    see output_sync.py. With `delete_remote` objects synced earlier whose
+    local file is gone are deleted; other objects under the prefix are never touched.
+
+    Auth for `azure` is the same as the Azure upload nodes (fields or .env).
+    `callback_url` receives one summary POST when something was uploaded or deleted.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "provider": (["s3", "azure"], {"default": "s3"}),
+                "bucket_or_container": ("STRING", {"default": ""}),
+                "prefix": ("STRING", {"default": "comfyui/output"}),
+                # Relative to ComfyUI's output directory; empty = the whole directory
+                "subfolder": ("STRING", {"default": ""}),
+                "region": ("STRING", {"default": ""}),
+
+                # Azure auth (leave blank to use .env)
+                "connection_string": ("STRING", {"default": "", "multiline": True}),
+                "account_name": ("STRING", {"default": ""}),
+                "account_key": ("STRING", {"default": ""}),
+
+                "callback_url": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                # Comma-separated, e.g. ".png,.mp4,.latent"; empty = every file
+                "extensions": ("STRING", {"default": ""}),
+                "delete_remote": ("BOOLEAN", {"default": False}),
+                "max_workers": ("INT", {"default": 8, "min": 1, "max": 64}),
+                # Only report what would be uploaded / deleted
+                "dry_run": ("BOOLEAN", {"default": False}),
+                "callback_mode": (CALLBACK_MODES, {"default": DEFAULT_CALLBACK_MODE}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT", "INT", "INT")
+    RETURN_NAMES = ("report", "uploaded", "unchanged", "deleted")
+    FUNCTION = "sync"
+    OUTPUT_NODE = True
+    CATEGORY = "JLNodes/cloud"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Always re-run: the output directory changes between prompts
+        return float("nan")
+
+    def sync(self, provider, bucket_or_container, prefix, subfolder, region, connection_string, account_name, account_key,
+             callback_url, extensions="", delete_remote=False, max_workers=8, dry_run=False,
+             callback_mode=DEFAULT_CALLBACK_MODE):
+        import folder_paths
+
+        output_dir = os.path.abspath(folder_paths.get_output_directory())
+        root = os.path.abspath(os.path.join(output_dir, subfolder.strip()))
+        if root != output_dir and not root.startswith(output_dir + os.sep):
+            raise ValueError(f"subfolder must stay inside the output directory: {subfolder}")
+
+        name = bucket_or_container.strip()
+        if provider == "azure":
+            backend = local_override(name) or AzureBackend(name, connection_string, account_name, account_key)
+        else:
+            backend = local_override(name) or S3Backend(name, region)
+
+        exts = ["." + e.strip().lower().lstrip(".") for e in extensions.split(",") if e.strip()]
+        report = sync_directory(
+            backend, root, prefix.strip(),
+            extensions=exts,
+            delete_remote=delete_remote,
+            max_workers=max_workers,
+            dry_run=dry_run,
+            transfer=transfer_options(),
+        )
+        print(
+            f"[OutputSyncNode] {root} -> {provider}:{name}/{prefix.strip()}: "
+            f"{len(report['uploaded'])} uploaded, {report['unchanged']} unchanged, "
+            f"{len(report['deleted'])} deleted, {len(report['failed'])} failed, "
+            f"{len(report['deferred'])} deferred in {report['seconds']}s"
+            + (" (dry run)" if dry_run else "")
+        )
+
+        if not dry_run and (report["uploaded"] or report["deleted"]):
+            send_callback(callback_url, report, callback_mode, source="OutputSyncNode")
+
+        text = json.dumps(report, indent=2)
+        return {
+            "ui": {"text": [text]},
+            "result": (text, len(report["uploaded"]), report["unchanged"], len(report["deleted"])),
+        }
+
+
+NODE_CLASS_MAPPINGS = {"OutputSyncNode": OutputSyncNode}
+NODE_DISPLAY_NAME_MAPPINGS = {"OutputSyncNode": "Sync Output Folder (S3/Azure)"}
@@ -1,11 +1,33 @@
-import io, os, time
-from PIL import Image
-import numpy as np
-import boto3, requests
+from .callbacks import CALLBACK_MODES, DEFAULT_MODE as DEFAULT_CALLBACK_MODE
+from .image_archive import ARCHIVE_MODES
+from .image_encoding import IMAGE_FORMATS
+from .upload_backends import S3Backend, local_override
+from .upload_metrics import ENABLED as METRICS_ENABLED, start_metrics
+from .upload_pipeline import upload_image_archive, upload_image_batch
 
 class S3ImageNode:
     """
-    Upload an IMAGE tensor as PNG to S3, return its URL, and optionally callback a Laravel endpoint.
+    Upload an IMAGE tensor (PNG, JPEG or WebP) to S3, return its URL, and optionally callback a Laravel endpoint.
+
+    With `batch_mode` every frame of the batch is encoded and uploaded (on up to
+    `max_workers` threads); `key_template` supports {timestamp}, {index} and {sha256}.
+    `url` is the newline-joined list of URLs, `urls` the list itself.
+
+    With `async_upload` the encoded images are spooled to disk and uploaded (plus
+    callback) by the background queue; the node returns the URLs immediately.
+
+    With `dedup` the encoded bytes are hashed ({sha256} is available in the key)
+    and uploads of bytes already present at the key are skipped; `dedup_verify_remote`
+    confirms that with a HEAD request.
+
+    With `collect_metrics` the `metrics` output is a JSON report of per-stage
+    timings and byte counts (encode, sign, upload, callback, ...).
+
+    With `archive_format` tar / zip the frames are encoded in parallel and streamed,
+    in batch order, into a single archive uploaded part by part while it is written
+    (`key_template` names the archive, `archive_member_template` the frames, with
+    {index} zero-padded). One callback describes the archive; async_upload and dedup
+    do not apply.
     """
     @classmethod
     def INPUT_TYPES(cls):
@@ -18,46 +40,57 @@ class S3ImageNode:
                 "mime": ("STRING", {"default": "image/png"}),
                 "use_signed_url": ("BOOLEAN", {"default": False}),
                 "callback_url": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                "batch_mode": ("BOOLEAN", {"default": True}),
+                "max_workers": ("INT", {"default": 4, "min": 1, "max": 32}),
+                # Encoder: png (compress_level 0-9), jpeg / webp (quality), webp_lossless
+                "image_format": (list(IMAGE_FORMATS), {"default": "png"}),
+                "quality": ("INT", {"default": 90, "min": 1, "max": 100}),
+                "compress_level": ("INT", {"default": 6, "min": 0, "max": 9}),
+                "async_upload": ("BOOLEAN", {"default": False}),
+                "dedup": ("BOOLEAN", {"default": False}),
+                "dedup_verify_remote": ("BOOLEAN", {"default": False}),
+                # sync | async (fire-and-forget) | async_batched (coalesced {"events": [...]} POSTs)
+                "callback_mode": (CALLBACK_MODES, {"default": DEFAULT_CALLBACK_MODE}),
+                # Per-stage timings/bytes on the `metrics` output (+ Prometheus file, see upload_metrics.py)
+                "collect_metrics": ("BOOLEAN", {"default": METRICS_ENABLED}),
+                # tar / zip: stream all frames into one archive object instead of one object per frame
+                "archive_format": (ARCHIVE_MODES, {"default": "none"}),
+                "archive_member_template": ("STRING", {"default": "frame_{index}.png"}),
             }
         }
 
-    RETURN_TYPES = ("IMAGE", "STRING")
-    RETURN_NAMES = ("image", "url")
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("image", "url", "urls", "metrics")
+    OUTPUT_IS_LIST = (False, False, True, False)
     FUNCTION = "upload"
     CATEGORY = "JLNodes/cloud"
 
-    def upload(self, image, bucket, key_template, region, mime, use_signed_url, callback_url):
-        key = key_template.replace("{timestamp}", str(int(time.time())))
-        path = key
-
-        # Convert image tensor → PNG bytes
-        arr = image[0].cpu().numpy()
-        arr = (np.clip(arr, 0, 1) * 255).astype("uint8")
-        pil = Image.fromarray(arr)
-        buf = io.BytesIO()
-        pil.save(buf, format="PNG")
-        buf.seek(0)
-        data = buf.getvalue()
-
-        # Upload to S3
-        s3 = boto3.client("s3", region_name=region or None)
-        s3.put_object(Bucket=bucket, Key=key, Body=data, ContentType=mime)
-
-        # Get URL
-        if use_signed_url:
-            url = s3.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=3600)
-        else:
-            # url = f"https://{bucket}.s3.{region}.amazonaws.com/{key}" if region else f"https://{bucket}.s3.amazonaws.com/{key}"
-            url = f"https://{bucket}/{key}"
-
-        # Optional callback
-        if callback_url:
-            try:
-                requests.post(callback_url, json={"url": url, "path": path, "provider": "s3"})
-            except Exception as e:
-                print(f"[S3ImageNode] Callback failed: {e}")
-
-        return (image, url)
+    def upload(self, image, bucket, key_template, region, mime, use_signed_url, callback_url, batch_mode=True, max_workers=4, image_format="png", quality=90, compress_level=6,
+               async_upload=False, dedup=False, dedup_verify_remote=False, callback_mode=DEFAULT_CALLBACK_MODE,
+               collect_metrics=METRICS_ENABLED, archive_format="none", archive_member_template="frame_{index}.png"):
+        # Encoding, keys, dedup, queueing and callbacks live in upload_pipeline.py
+        metrics = start_metrics("S3ImageNode", collect_metrics)
+        backend = local_override(bucket) or S3Backend(bucket, region)
+        if archive_format != "none":
+            url = upload_image_archive(
+                backend, image, key_template, archive_member_template, archive_format,
+                use_signed_url=use_signed_url, signed_expires=3600,
+                batch_mode=batch_mode, max_workers=max_workers,
+                image_format=image_format, quality=quality, compress_level=compress_level,
+                callback_url=callback_url, callback_mode=callback_mode, source="S3ImageNode", metrics=metrics,
+            )
+            return (image, url, [url], metrics.finish())
+        urls = upload_image_batch(
+            backend, image, key_template, mime,
+            use_signed_url=use_signed_url, signed_expires=3600,
+            batch_mode=batch_mode, max_workers=max_workers,
+            image_format=image_format, quality=quality, compress_level=compress_level,
+            dedup=dedup, dedup_verify_remote=dedup_verify_remote, async_upload=async_upload,
+            callback_url=callback_url, callback_mode=callback_mode, source="S3ImageNode", metrics=metrics,
+        )
+        return (image, "\n".join(urls), urls, metrics.finish())
 
 NODE_CLASS_MAPPINGS = {"S3ImageNode": S3ImageNode}
 NODE_DISPLAY_NAME_MAPPINGS = {"S3ImageNode": "S3 Upload (Image)"}
@@ -1,9 +1,16 @@
 # s3_video_node.py
-import os
-import time
+import json
 
-import boto3
-import requests
+from .callbacks import CALLBACK_MODES, DEFAULT_MODE as DEFAULT_CALLBACK_MODE
+from .upload_backends import S3Backend, local_override
+from .upload_metrics import ENABLED as METRICS_ENABLED, start_metrics
+from .upload_pipeline import (
+    pick_path_from_vhs,
+    select_vhs_paths,
+    transfer_options,
+    upload_local_file,
+    upload_local_files,
+)
 
 
 class S3VideoNode:
@@ -14,6 +21,15 @@ class S3VideoNode:
     - If `use_signed_url = False`, make sure your bucket/object ACL/policy allows public read.
 
     It can also take the Video Helper Suite output directly via 'vhs_filenames'.
+
+    With `upload_all` every VHS output (optionally filtered by `vhs_indices` /
+    `vhs_extensions`) is uploaded concurrently and a single callback
+    {"files": [...]} is sent; `url` is still the `prefer_index` file and `files`
+    is a JSON object mapping each local path to its URL. A failed file is marked
+    "error" in the callback and the node fails after the callback is sent.
+
+    With `collect_metrics` the `metrics` output is a JSON report of per-stage
+    timings and byte counts (encode, sign, upload, callback, ...).
     """
 
     @classmethod
@@ -34,78 +50,66 @@ class S3VideoNode:
                 "vhs_filenames": ("VHS_FILENAMES",),
                 # -1 picks the last file (usually the final video). 0=first entry, 1=second, etc.
                 "prefer_index": ("INT", {"default": -1, "min": -10, "max": 10}),
+                # Multi-file mode: upload every VHS entry (or those at `vhs_indices`, e.g. "0,-1",
+                # and/or with `vhs_extensions`, e.g. ".png,.mp4"); `files` maps local path -> URL
+                "upload_all": ("BOOLEAN", {"default": False}),
+                "vhs_indices": ("STRING", {"default": ""}),
+                "vhs_extensions": ("STRING", {"default": ""}),
+                # Multipart streaming for large files (smaller files use a single put)
+                "use_multipart": ("BOOLEAN", {"default": True}),
+                "multipart_threshold_mb": ("INT", {"default": 64, "min": 5, "max": 5120}),
+                "part_size_mb": ("INT", {"default": 16, "min": 5, "max": 5120}),
+                "max_concurrency": ("INT", {"default": 4, "min": 1, "max": 32}),
+                "resumable": ("BOOLEAN", {"default": True}),
+                "async_upload": ("BOOLEAN", {"default": False}),
+                "dedup": ("BOOLEAN", {"default": False}),
+                "dedup_verify_remote": ("BOOLEAN", {"default": False}),
+                # sync | async (fire-and-forget) | async_batched (coalesced {"events": [...]} POSTs)
+                "callback_mode": (CALLBACK_MODES, {"default": DEFAULT_CALLBACK_MODE}),
+                # Per-stage timings/bytes on the `metrics` output (+ Prometheus file, see upload_metrics.py)
+                "collect_metrics": ("BOOLEAN", {"default": METRICS_ENABLED}),
             }
         }
 
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("url",)
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("url", "metrics", "files")
     FUNCTION = "upload"
     CATEGORY = "JLNodes/cloud"
 
-    def _pick_path_from_vhs(self, vhs_filenames, prefer_index=-1):
-        # Expected VHS structure: (save_output:boolean, [png_path, mp4_path, ...])
-        try:
-            if isinstance(vhs_filenames, (list, tuple)) and len(vhs_filenames) >= 2:
-                paths = vhs_filenames[1]
-                if isinstance(paths, (list, tuple)) and len(paths) > 0:
-                    return str(paths[prefer_index])
-        except Exception as e:
-            print(f"[S3VideoNode] Could not parse VHS_FILENAMES: {e}")
-        return None
-
-    def upload(self, file_path, bucket, key_template, region, mime, use_signed_url, signed_expires, callback_url, vhs_filenames=None, prefer_index=-1):
-
-        # If VHS output provided, pick the mp4 path from it
-        if vhs_filenames is not None:
-            picked = self._pick_path_from_vhs(vhs_filenames, prefer_index)
-            if picked:
-                file_path = picked
-
-        # 1) Validate file
-        file_path = (file_path or "").strip()
-        if not os.path.isfile(file_path):
-            print(f"[S3VideoNode] File not found: {file_path}")
-            return ("",)
-
-        # 2) Build S3 key
-        basename = os.path.basename(file_path)
-        timestamp = str(int(time.time()))
-        key = (key_template or "").replace("{basename}", basename).replace("{timestamp}", timestamp)
-
-        # 3) Read file bytes (simple & clear)
-        with open(file_path, "rb") as f:
-            data = f.read()
-
-        # 4) Upload to S3
-        s3 = boto3.client("s3", region_name=region or None)
-        s3.put_object(Bucket=bucket, Key=key, Body=data, ContentType=mime)
-
-        # 5) Build URL
-        if use_signed_url:
-            url = s3.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": bucket, "Key": key},
-                ExpiresIn=int(signed_expires) if signed_expires else 3600,
-            )
+    def upload(self, file_path, bucket, key_template, region, mime, use_signed_url, signed_expires, callback_url, vhs_filenames=None, prefer_index=-1,
+               upload_all=False, vhs_indices="", vhs_extensions="",
+               use_multipart=True, multipart_threshold_mb=64, part_size_mb=16, max_concurrency=4, resumable=True,
+               async_upload=False, dedup=False, dedup_verify_remote=False, callback_mode=DEFAULT_CALLBACK_MODE,
+               collect_metrics=METRICS_ENABLED):
+
+        # Streaming, keys, dedup, queueing and callbacks live in upload_pipeline.py
+        metrics = start_metrics("S3VideoNode", collect_metrics)
+        backend = local_override(bucket) or S3Backend(bucket, region)
+        template = key_template or ""
+        options = dict(
+            use_signed_url=use_signed_url, signed_expires=signed_expires,
+            transfer=transfer_options(use_multipart, multipart_threshold_mb, part_size_mb, max_concurrency, resumable),
+            dedup=dedup, dedup_verify_remote=dedup_verify_remote, async_upload=async_upload,
+            callback_url=callback_url, callback_mode=callback_mode, source="S3VideoNode", metrics=metrics,
+        )
+
+        # Multi-file mode: every selected VHS output, concurrently, one aggregated callback
+        if upload_all and vhs_filenames is not None:
+            paths = select_vhs_paths(vhs_filenames, vhs_indices, vhs_extensions, source="S3VideoNode")
+            files = upload_local_files(backend, paths, template, mime, **options)
+            primary = pick_path_from_vhs(vhs_filenames, prefer_index, source="S3VideoNode")
+            url = files.get(primary) or (list(files.values())[-1] if files else "")
         else:
-            # url = f"https://{bucket}.s3.{region}.amazonaws.com/{key}" if region else f"https://{bucket}.s3.amazonaws.com/{key}"
-            url = f"https://{bucket}/{key}"
-
-        print(f"[S3VideoNode] Uploaded {basename} -> {url}")
-
-        # 6) Optional callback
-        if callback_url:
-            try:
-                requests.post(
-                    callback_url,
-                    json={"url": url, "provider": "s3", "mime": mime, "size_bytes": len(data)},
-                    timeout=20,
-                )
-            except Exception as e:
-                print(f"[S3VideoNode] Callback failed: {e}")
-
-        # 7) Return URL (works nicely with Display Any)
-        return (url,)
+            # If VHS output provided, pick the mp4 path from it
+            if vhs_filenames is not None:
+                picked = pick_path_from_vhs(vhs_filenames, prefer_index, source="S3VideoNode")
+                if picked:
+                    file_path = picked
+            url = upload_local_file(backend, file_path, template, mime, **options)
+            files = {file_path.strip(): url} if url else {}
+
+        # Return URL (works nicely with Display Any)
+        return (url, metrics.finish(), json.dumps(files))
 
 
 NODE_CLASS_MAPPINGS = {"S3VideoNode": S3VideoNode}
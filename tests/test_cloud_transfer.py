@@ -0,0 +1,231 @@
+# test_cloud_transfer.py
+"""S3 / Azure transfers (cloud_transfer.py, upload_limits.py) against the fake object store."""
+import os
+import time
+
+import pytest
+
+from conftest import MB, load
+
+backends = load("upload_backends")
+cloud_transfer = load("cloud_transfer")
+upload_limits = load("upload_limits")
+
+
+@pytest.fixture
+def s3(object_store):
+    return backends.S3Backend("bucket")
+
+
+@pytest.fixture
+def azure(object_store):
+    return backends.AzureBackend("container")
+
+
+def _file(tmp_path, size, name="video.mp4"):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def _stored_size(store, path):
+    with store.lock:
+        return store.objects[path]["size"]
+
+
+def _bytes_in(store):
+    return store.stats.snapshot()["bytes_in"]
+
+
+# ---------- part planning / streaming ----------
+
+def test_plan_parts():
+    assert cloud_transfer.plan_parts(10, 4) == [(1, 0, 4), (2, 4, 4), (3, 8, 2)]
+    assert cloud_transfer.plan_parts(0, 4) == []
+    # min part size wins over a smaller request
+    assert cloud_transfer.plan_parts(10, 1, min_part_size=5) == [(1, 0, 5), (2, 5, 5)]
+    # too many parts: the part size grows to fit max_parts
+    parts = cloud_transfer.plan_parts(100, 1, max_parts=8)
+    assert len(parts) <= 8 and sum(length for _, _, length in parts) == 100
+
+
+def test_part_stream_cuts_parts_in_order():
+    sent = []
+
+    def send(number, data):
+        time.sleep(0.01 * (4 - number))  # finish out of order
+        sent.append(number)
+        return (number, bytes(data))
+
+    stream = cloud_transfer.PartStream(send, part_size=4, max_concurrency=3)
+    for piece in (b"ab", b"cdefg", b"hij"):
+        stream.write(piece)
+    assert stream.close() == [(1, b"abcd"), (2, b"efgh"), (3, b"ij")]
+    assert stream.size == 10 and sorted(sent) == [1, 2, 3]
+
+
+def test_part_stream_sends_one_empty_part():
+    stream = cloud_transfer.PartStream(lambda number, data: (number, data), part_size=4)
+    assert stream.close() == [(1, b"")]
+
+
+# ---------- journaled resume / restart ----------
+
+def test_s3_multipart_resumes_missing_parts(s3, object_store, tmp_path):
+    size = 12 * MB + 1  # parts of 5, 5 and 2 MiB
+    path = _file(tmp_path, size)
+    object_store.fail_parts.add(2)
+    with pytest.raises(Exception):
+        s3.put_file("resume/video.mp4", path, "video/mp4", threshold=1, part_size=5 * MB)
+
+    before = _bytes_in(object_store)
+    s3.put_file("resume/video.mp4", path, "video/mp4", threshold=1, part_size=5 * MB)
+
+    assert 5 * MB <= _bytes_in(object_store) - before < 5 * MB + 64 * 1024  # part 2 (+ the completion)
+    assert _stored_size(object_store, "bucket/resume/video.mp4") == size
+    assert os.listdir(load("upload_journal").JOURNAL_DIR) == []
+
+
+def test_s3_multipart_restarts_lost_upload(s3, object_store, tmp_path):
+    size = 12 * MB + 1
+    path = _file(tmp_path, size)
+    object_store.fail_parts.add(2)
+    with pytest.raises(Exception):
+        s3.put_file("lost/video.mp4", path, "video/mp4", threshold=1, part_size=5 * MB)
+    with object_store.lock:
+        object_store.uploads.clear()  # aborted / expired server-side
+
+    s3.put_file("lost/video.mp4", path, "video/mp4", threshold=1, part_size=5 * MB)
+
+    assert _stored_size(object_store, "bucket/lost/video.mp4") == size
+
+
+def test_azure_blocks_resume_missing_blocks(azure, object_store, tmp_path):
+    size = 9 * MB + 1  # blocks of 4, 4 and 1 MiB
+    path = _file(tmp_path, size)
+    object_store.fail_parts.add(2)
+    with pytest.raises(Exception):
+        azure.put_file("resume/video.mp4", path, "video/mp4", threshold=1, part_size=4 * MB)
+
+    before = _bytes_in(object_store)
+    azure.put_file("resume/video.mp4", path, "video/mp4", threshold=1, part_size=4 * MB)
+
+    assert 4 * MB <= _bytes_in(object_store) - before < 4 * MB + 64 * 1024  # block 2 (+ the block list)
+    assert _stored_size(object_store, "devstoreaccount1/container/resume/video.mp4") == size
+
+
+def test_azure_blocks_restart_after_block_gc(azure, object_store, tmp_path):
+    size = 9 * MB + 1
+    path = _file(tmp_path, size)
+    object_store.fail_parts.add(2)
+    with pytest.raises(Exception):
+        azure.put_file("lost/video.mp4", path, "video/mp4", threshold=1, part_size=4 * MB)
+    with object_store.lock:
+        object_store.blocks.clear()  # uncommitted blocks garbage-collected
+
+    before = _bytes_in(object_store)
+    azure.put_file("lost/video.mp4", path, "video/mp4", threshold=1, part_size=4 * MB)
+
+    assert _bytes_in(object_store) - before >= size + 4 * MB  # block 2, then everything again
+    assert os.listdir(load("upload_journal").JOURNAL_DIR) == []
+
+
+# ---------- limiter ----------
+
+def test_throttled_body_is_paced(monkeypatch):
+    monkeypatch.setattr(upload_limits, "_bucket", upload_limits.TokenBucket(8 * MB, float(MB)))
+    start = time.monotonic()
+    with upload_limits.transfer(3 * MB) as t:
+        body = t.body(os.urandom(3 * MB))
+        while body.read(64 * 1024):
+            pass
+    # 1 MiB burst, then 2 MiB at 8 MiB/s
+    assert time.monotonic() - start >= 0.2
+
+
+def test_small_transfer_keeps_a_slot(monkeypatch):
+    slots = upload_limits.TransferSlots(2)
+    monkeypatch.setattr(upload_limits, "_slots", slots)
+    with upload_limits.transfer(64 * MB):
+        # large transfers may hold all but one slot; a small one still gets in at once
+        assert slots._limit_for(upload_limits.PRIORITY_LARGE) == 1
+        start = time.monotonic()
+        with upload_limits.transfer(100_000):
+            assert slots.active == 2
+        assert time.monotonic() - start < 0.1
+
+
+# ---------- bandwidth accounting: each body is paid for once ----------
+
+def test_s3_put_pays_body_once(s3, object_store, tmp_path, paid):
+    s3.put_bytes("paid/image.png", os.urandom(MB + 7), "image/png")
+    assert sum(paid) == MB + 7
+
+    del paid[:]
+    s3.put_file("paid/small.mp4", _file(tmp_path, 3 * MB), "video/mp4", multipart=False)
+    assert sum(paid) == 3 * MB
+    assert _stored_size(object_store, "bucket/paid/small.mp4") == 3 * MB
+
+
+def test_s3_multipart_pays_body_once(s3, object_store, tmp_path, paid):
+    size = 12 * MB + 1
+    s3.put_file("paid/video.mp4", _file(tmp_path, size), "video/mp4",
+                threshold=1, part_size=5 * MB, resumable=False)
+    assert sum(paid) == size
+    assert _stored_size(object_store, "bucket/paid/video.mp4") == size
+
+
+def test_azure_put_and_blocks_pay_body_once(azure, tmp_path, paid):
+    azure.put_bytes("paid/image.png", os.urandom(MB + 7), "image/png")
+    assert sum(paid) == MB + 7
+
+    del paid[:]
+    size = 9 * MB + 1
+    azure.put_file("paid/video.mp4", _file(tmp_path, size), "video/mp4",
+                   threshold=1, part_size=4 * MB, resumable=False)
+    assert sum(paid) == size
+
+
+# ---------- abandoned resumable uploads are aborted server-side ----------
+
+journal_mod = load("upload_journal")
+
+
+def _open_upload(s3, key, file_path, part_size=5 * MB):
+    # A journaled multipart upload left open, as after an interrupted put_file
+    client = s3.client
+    upload_id = client.create_multipart_upload(Bucket=s3.bucket, Key=key)["UploadId"]
+    journal = journal_mod.UploadJournal("s3", s3.destination(key), file_path, part_size)
+    journal.start(bucket=s3.bucket, key=key, region=client.meta.region_name, upload_id=upload_id)
+    return journal, upload_id
+
+
+def test_gc_aborts_stale_s3_upload(s3, object_store, tmp_path):
+    journal, upload_id = _open_upload(s3, "gc/video.mp4", _file(tmp_path, MB))
+    assert upload_id in object_store.uploads
+
+    journal_mod.gc_journals(max_age=-1)
+
+    assert upload_id not in object_store.uploads
+    assert not os.path.exists(journal.path)
+
+
+def test_new_file_version_aborts_previous_upload(s3, object_store, tmp_path):
+    path = _file(tmp_path, MB)
+    old, upload_id = _open_upload(s3, "rerender/video.mp4", path)
+    os.utime(path, ns=(0, 0))  # re-rendered: new mtime, new journal
+
+    s3.put_file("rerender/video.mp4", path, "video/mp4", threshold=1, part_size=5 * MB)
+
+    assert upload_id not in object_store.uploads
+    assert not os.path.exists(old.path)
+    assert _stored_size(object_store, "bucket/rerender/video.mp4") == MB
+
+
+def test_part_size_change_aborts_previous_upload(s3, object_store, tmp_path):
+    path = _file(tmp_path, MB)
+    _, upload_id = _open_upload(s3, "resize/video.mp4", path, part_size=5 * MB)
+
+    s3.put_file("resize/video.mp4", path, "video/mp4", threshold=1, part_size=6 * MB)
+
+    assert upload_id not in object_store.uploads
@@ -0,0 +1,61 @@
+# test_latent_cache.py
+"""LatentCache (latent_cache.py): variants of one file, invalidation on change."""
+import os
+
+import torch
+
+from conftest import load
+
+latent_cache = load("latent_cache")
+
+
+def _settled_file(tmp_path, data=b"x", mtime=1):
+    # An old mtime: outside file_index's racy window, so the entry is cached
+    path = tmp_path / "a.latent"
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_variants_of_one_file_are_cached_side_by_side(tmp_path):
+    cache = latent_cache.LatentCache(1 << 20)
+    path = _settled_file(tmp_path)
+
+    for _ in range(3):
+        for variant in ("standard:False", "mmap:False", "mmap:True"):
+            cache.get_or_load(path, lambda _: torch.zeros(4), variant=variant)
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["misses"], stats["hits"], stats["stale"]) == (3, 3, 6, 0)
+
+
+def test_changed_file_drops_every_variant(tmp_path):
+    cache = latent_cache.LatentCache(1 << 20)
+    path = _settled_file(tmp_path)
+    for variant in ("standard:False", "mmap:True"):
+        cache.get_or_load(path, lambda _: torch.zeros(4), variant=variant)
+
+    _settled_file(tmp_path, b"yy", mtime=2)
+    fresh = cache.get_or_load(path, lambda _: torch.ones(4), variant="mmap:True")
+
+    assert torch.equal(fresh, torch.ones(4))
+    assert cache.stats()["stale"] == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_invalidate_drops_every_variant(tmp_path):
+    cache = latent_cache.LatentCache(1 << 20)
+    path = _settled_file(tmp_path)
+    for variant in ("a", "b"):
+        cache.get_or_load(path, lambda _: torch.zeros(4), variant=variant)
+
+    cache.invalidate(path)
+
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_callers_get_private_copies(tmp_path):
+    cache = latent_cache.LatentCache(1 << 20)
+    path = _settled_file(tmp_path)
+    cache.get_or_load(path, lambda _: torch.zeros(4)).add_(1)
+    assert torch.equal(cache.get_or_load(path, lambda _: torch.zeros(4)), torch.zeros(4))
@@ -0,0 +1,35 @@
+# test_output_sync.py
+"""sync_directory (output_sync.py) against LocalBackend."""
+import os
+
+from conftest import load
+
+output_sync = load("output_sync")
+backends = load("upload_backends")
+
+
+def _write(path, data, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_skips_temp_files_and_defers_fresh_ones(tmp_path):
+    root = tmp_path / "output"
+    backend = backends.LocalBackend("sync", root=str(tmp_path / "store"))
+    _write(root / "done.latent", b"done", mtime=1)
+    _write(root / "run" / "partial.latent.tmp4242", b"par", mtime=1)  # a writer's temp file
+    _write(root / "fresh.png", b"fresh")  # just written, may still be growing
+
+    report = output_sync.sync_directory(backend, str(root))
+
+    assert [entry["path"] for entry in report["uploaded"]] == ["done.latent"]
+    assert report["deferred"] == ["fresh.png"]
+    assert not os.path.exists(backend.destination("run/partial.latent.tmp4242"))
+
+    # Once settled it goes out on the next run
+    os.utime(root / "fresh.png", (2, 2))
+    report = output_sync.sync_directory(backend, str(root))
+    assert [entry["path"] for entry in report["uploaded"]] == ["fresh.png"]
+    assert report["deferred"] == [] and report["unchanged"] == 1
@@ -0,0 +1,54 @@
+# test_upload_dedup.py
+"""The dedup index (upload_dedup.py) across restarts."""
+import pytest
+
+from conftest import load
+
+upload_dedup = load("upload_dedup")
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """A fresh index file; `restart()` drops the in-memory copy like a new process."""
+    monkeypatch.setattr(upload_dedup, "INDEX_PATH", str(tmp_path / "dedup_index.jsonl"))
+
+    def restart():
+        monkeypatch.setattr(upload_dedup, "_index", None)
+
+    restart()
+    return restart
+
+
+def _lines():
+    with open(upload_dedup.INDEX_PATH, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_forget_survives_restart(index):
+    for name in ("a", "b", "c"):
+        upload_dedup.mark_uploaded("s3", f"bucket/{name}.png", name * 2)
+    upload_dedup.forget("s3", "bucket/a.png")
+    assert len(_lines()) == 4  # a tombstone, not compacted yet
+
+    index()
+    assert not upload_dedup.is_known("s3", "bucket/a.png", "aa")
+    assert upload_dedup.is_known("s3", "bucket/b.png", "bb")
+
+
+def test_deleted_remotely_is_uploaded_again_after_restart(index):
+    upload_dedup.mark_uploaded("s3", "bucket/a.png", "aa")
+    assert not upload_dedup.already_uploaded("s3", "bucket/a.png", "aa", remote_digest=lambda: None)
+
+    index()
+    assert not upload_dedup.already_uploaded("s3", "bucket/a.png", "aa")
+
+
+def test_index_is_compacted(index):
+    for i in range(10):
+        upload_dedup.mark_uploaded("s3", "bucket/a.png", f"digest{i}")  # re-rendered 10 times
+    upload_dedup.mark_uploaded("s3", "bucket/b.png", "bb")
+
+    assert len(_lines()) <= 4  # dead records never outnumber the 2 live entries for long
+    index()
+    assert upload_dedup.is_known("s3", "bucket/a.png", "digest9")
+    assert upload_dedup.is_known("s3", "bucket/b.png", "bb")
@@ -0,0 +1,181 @@
+# test_upload_pipeline.py
+"""upload_pipeline end to end against LocalBackend (no cloud credentials needed)."""
+import hashlib
+import os
+
+import pytest
+import torch
+
+from conftest import load
+
+pipeline = load("upload_pipeline")
+backends = load("upload_backends")
+upload_queue = load("upload_queue")
+
+
+def _local(tmp_path, namespace="bucket"):
+    return backends.LocalBackend(namespace, root=str(tmp_path / "store"))
+
+
+def _stored(backend, key):
+    with open(backend.destination(key), "rb") as f:
+        return f.read()
+
+
+def test_image_batch_index_keys(tmp_path, callbacks):
+    backend = _local(tmp_path)
+    image = torch.rand(3, 8, 8, 3)
+
+    urls = pipeline.upload_image_batch(backend, image, "frames/{index}.png", "image/png",
+                                       callback_url="http://callback")
+
+    keys = [f"frames/{i}.png" for i in range(3)]
+    assert urls == [backend.url(key) for key in keys]
+    for key in keys:
+        assert _stored(backend, key).startswith(b"\x89PNG")
+    assert sorted(payload["index"] for _, payload in callbacks) == [0, 1, 2]
+    assert all(payload["path"] in keys and "deduplicated" not in payload for _, payload in callbacks)
+
+
+def test_image_batch_sha256_keys(tmp_path, callbacks):
+    backend = _local(tmp_path)
+    image = torch.rand(2, 8, 8, 3)
+
+    urls = pipeline.upload_image_batch(backend, image, "frames/{sha256}.png", "image/png")
+
+    assert len(set(urls)) == 2
+    for _, payload in callbacks:
+        data = _stored(backend, payload["path"])
+        assert payload["path"] == f"frames/{hashlib.sha256(data).hexdigest()}.png"
+
+
+def test_image_batch_dedup_skips_known_bytes(tmp_path, callbacks):
+    backend = _local(tmp_path)
+    image = torch.rand(2, 8, 8, 3)
+
+    first = pipeline.upload_image_batch(backend, image, "frames/{index}.png", "image/png", dedup=True)
+    stamps = [os.stat(backend.destination(f"frames/{i}.png")).st_mtime_ns for i in range(2)]
+    del callbacks[:]
+    second = pipeline.upload_image_batch(backend, image, "frames/{index}.png", "image/png", dedup=True)
+
+    assert second == first
+    assert [os.stat(backend.destination(f"frames/{i}.png")).st_mtime_ns for i in range(2)] == stamps
+    assert len(callbacks) == 2 and all(payload["deduplicated"] for _, payload in callbacks)
+    assert backend.remote_digest("frames/0.png") == hashlib.sha256(_stored(backend, "frames/0.png")).hexdigest()
+
+
+def test_local_files_one_aggregated_callback(tmp_path, callbacks):
+    backend = _local(tmp_path)
+    paths = []
+    for name in ("a.mp4", "b.txt"):
+        path = tmp_path / name
+        path.write_bytes(name.encode() * 100)
+        paths.append(str(path))
+
+    urls = pipeline.upload_local_files(backend, paths + [str(tmp_path / "missing.mp4")], "videos/out.mp4",
+                                       "application/octet-stream", callback_url="http://callback")
+
+    assert urls == {p: backend.url(f"videos/{os.path.basename(p)}") for p in paths}
+    assert _stored(backend, "videos/a.mp4") == b"a.mp4" * 100
+    assert len(callbacks) == 1
+    url, payload = callbacks[0]
+    assert url == "http://callback"
+    assert [(f["path"], f["mime"], f["status"]) for f in payload["files"]] == [
+        ("videos/a.mp4", "video/mp4", "uploaded"),
+        ("videos/b.txt", "text/plain", "uploaded"),
+    ]
+
+
+def test_async_upload_round_trip(tmp_path, callbacks):
+    backend = _local(tmp_path)
+    image = torch.rand(2, 8, 8, 3)
+
+    urls = pipeline.upload_image_batch(backend, image, "queued/{index}.png", "image/png",
+                                       async_upload=True, callback_url="http://callback")
+    assert upload_queue.wait_until_idle(timeout=30)
+
+    assert urls == [backend.url(f"queued/{i}.png") for i in range(2)]
+    for i in range(2):
+        assert _stored(backend, f"queued/{i}.png").startswith(b"\x89PNG")
+    assert sorted(payload["index"] for _, payload in callbacks) == [0, 1]
+    assert os.listdir(upload_queue.PENDING_DIR) == []
+
+
+def test_async_local_files_round_trip(tmp_path, callbacks):
+    backend = _local(tmp_path)
+    paths = []
+    for name in ("a.bin", "b.bin"):
+        path = tmp_path / name
+        path.write_bytes(os.urandom(1000))
+        paths.append(str(path))
+
+    pipeline.upload_local_files(backend, paths, "out/{basename}", "application/octet-stream",
+                                async_upload=True, callback_url="http://callback")
+    assert upload_queue.wait_until_idle(timeout=30)
+
+    for path in paths:
+        with open(path, "rb") as f:
+            assert _stored(backend, f"out/{os.path.basename(path)}") == f.read()
+    assert len(callbacks) == 1
+    assert [f["status"] for f in callbacks[0][1]["files"]] == ["uploaded", "uploaded"]
+
+
+def test_backend_from_params():
+    local = backends.LocalBackend("ns", root="/tmp/store", base_url="http://files")
+    restored = backends.backend_from_params(local.to_params())
+    assert isinstance(restored, backends.LocalBackend)
+    assert restored.to_params() == local.to_params()
+    assert restored.url("a/b.png") == "http://files/ns/a/b.png"
+
+    s3_params = {"type": "s3", "bucket": "bkt", "region": "eu-west-1"}
+    s3 = backends.backend_from_params(s3_params)
+    assert isinstance(s3, backends.S3Backend)
+    assert s3.to_params() == s3_params
+
+    with pytest.raises(ValueError, match="ftp"):
+        backends.backend_from_params({"type": "ftp"})
+
+
+def test_local_files_failure_still_sends_callback(tmp_path, callbacks, monkeypatch):
+    backend = _local(tmp_path)
+    paths = []
+    for name in ("ok.mp4", "bad.mp4"):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 100)
+        paths.append(str(path))
+    put_file = backend.put_file
+
+    def failing_put_file(key, file_path, *args, **kwargs):
+        if file_path.endswith("bad.mp4"):
+            raise OSError("disk on fire")
+        return put_file(key, file_path, *args, **kwargs)
+
+    monkeypatch.setattr(backend, "put_file", failing_put_file)
+
+    with pytest.raises(RuntimeError, match="1 of 2 file.*bad.mp4: disk on fire"):
+        pipeline.upload_local_files(backend, paths, "videos/{basename}", "video/mp4",
+                                    callback_url="http://callback")
+
+    assert len(callbacks) == 1
+    files = {f["path"]: f for f in callbacks[0][1]["files"]}
+    assert files["videos/ok.mp4"]["status"] == "uploaded"
+    assert files["videos/bad.mp4"]["status"] == "error"
+    assert files["videos/bad.mp4"]["error"] == "disk on fire"
+    assert _stored(backend, "videos/ok.mp4") == b"x" * 100
+
+
+def test_azure_params_hold_no_secrets():
+    azure = backends.AzureBackend("container", account_name="acct", account_key="s3cr3t-key")
+    params = azure.to_params()
+    assert "s3cr3t" not in repr(params)
+    assert params["account_name"] == "acct" and params["credential_ref"]
+
+    # Recalled from memory when the queued job runs in this process
+    restored = backends.backend_from_params(params)
+    assert restored.account_key == "s3cr3t-key"
+    assert restored.to_params() == params
+
+    # After a restart the secret is gone: fail instead of using other credentials
+    lost = backends.backend_from_params(dict(params, credential_ref="0" * 16))
+    with pytest.raises(ValueError, match="node inputs"):
+        lost.connect()
@@ -0,0 +1,445 @@
+# upload_backends.py
+"""
+Storage backends behind the upload pipeline (upload_pipeline.py).
+
+Every backend maps an object key to a destination and knows how to
+  - put_bytes / put_file (streamed, multipart/blocks, resumable where supported),
+    put_stream (data of unknown size written by a callback, e.g. an archive),
+    all return the stored object's ETag
+  - delete an object
+  - build the public or signed URL of a key (locally, no network)
+  - report the sha256 metadata of a stored object (dedup HEAD check)
+  - serialize itself to plain params so queued jobs can rebuild it after a restart
+
+Backends:
+  S3Backend     bucket + region, pooled boto3 client (cloud_clients.py)
+  AzureBackend  container + connection string / account credentials
+  LocalBackend  a directory (optionally served over HTTP) standing in for a bucket,
+                for development and tests without credentials or network
+
+Every request carrying data runs under upload_limits.transfer and sends its
+body through the transfer's paced reader (process-wide concurrency /
+bandwidth limits, small uploads first).
+
+Set JLNODES_UPLOAD_BACKEND=local to route every cloud node to LocalBackend
+(files go to JLNODES_LOCAL_UPLOAD_DIR, URLs start with JLNODES_LOCAL_UPLOAD_URL).
+"""
+import io
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from .cloud_clients import (
+    get_blob_service_client, get_s3_client, recall_credentials, remember_credentials, upload_to_container,
+)
+from .cloud_transfer import (
+    MB, azure_block_upload, azure_stream_upload, content_md5, s3_multipart_upload, s3_stream_upload,
+)
+from .file_index import temp_path
+from .upload_journal import STATE_DIR, UploadJournal, gc_journals, register_aborter
+from .upload_limits import transfer
+
+LOCAL_UPLOAD_DIR = os.getenv("JLNODES_LOCAL_UPLOAD_DIR", os.path.join(STATE_DIR, "local_uploads"))
+LOCAL_UPLOAD_URL = os.getenv("JLNODES_LOCAL_UPLOAD_URL", "")
+
+
+class UploadBackend:
+    provider = ""
+
+    def connect(self):
+        """Resolve the (pooled) client up front, so its cost is measured on its own."""
+
+    def destination(self, key):
+        """Stable identifier of `key` in this backend (used by journals and the dedup index)."""
+        raise NotImplementedError
+
+    def url(self, key, use_signed_url=False, signed_expires=3600):
+        raise NotImplementedError
+
+    def put_bytes(self, key, data, mime, metadata=None):
+        """Store `data` at `key`. Returns the object's ETag."""
+        raise NotImplementedError
+
+    def put_file(self, key, file_path, mime, metadata=None, multipart=True, threshold=64 * MB,
+                 part_size=16 * MB, max_concurrency=4, resumable=True):
+        """Stream `file_path` to `key`. Returns the object's ETag."""
+        raise NotImplementedError
+
+    def put_stream(self, key, write, mime, metadata=None, part_size=16 * MB, max_concurrency=4):
+        """Upload whatever `write(fileobj)` writes to `key`, in parts as it is written. Returns the object's ETag."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Delete `key`; a missing object is not an error."""
+        raise NotImplementedError
+
+    def remote_digest(self, key):
+        """sha256 metadata of the stored object: None if missing, "" if stored without it."""
+        raise NotImplementedError
+
+    def to_params(self):
+        raise NotImplementedError
+
+    def _journal(self, key, file_path, part_size, resumable):
+        if not resumable:
+            return None
+        gc_journals()
+        return UploadJournal(self.provider, self.destination(key), file_path, part_size)
+
+
+# ---------- S3 ----------
+
+class S3Backend(UploadBackend):
+    provider = "s3"
+
+    def __init__(self, bucket, region=""):
+        self.bucket = bucket
+        self.region = region or ""
+
+    @property
+    def client(self):
+        return get_s3_client(self.region)
+
+    def connect(self):
+        self.client
+
+    def destination(self, key):
+        return f"{self.bucket}/{key}"
+
+    def url(self, key, use_signed_url=False, signed_expires=3600):
+        if use_signed_url:
+            return self.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=int(signed_expires) if signed_expires else 3600,
+            )
+        # return f"https://{bucket}.s3.{region}.amazonaws.com/{key}" if region else f"https://{bucket}.s3.amazonaws.com/{key}"
+        return f"https://{self.bucket}/{key}"
+
+    def put_bytes(self, key, data, mime, metadata=None):
+        with transfer(len(data)) as t:
+            resp = self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=t.body(data), ContentType=mime, Metadata=metadata or {},
+                ContentLength=len(data), ContentMD5=content_md5(data),
+            )
+        return resp.get("ETag", "")
+
+    def put_file(self, key, file_path, mime, metadata=None, multipart=True, threshold=64 * MB,
+                 part_size=16 * MB, max_concurrency=4, resumable=True):
+        s3 = self.client
+        size_bytes = os.path.getsize(file_path)
+        if multipart and size_bytes >= threshold:
+            return s3_multipart_upload(
+                s3, self.bucket, key, file_path, mime,
+                part_size=part_size,
+                max_concurrency=max_concurrency,
+                journal=self._journal(key, file_path, part_size, resumable),
+                metadata=metadata,
+            )
+        with open(file_path, "rb") as f:
+            md5 = content_md5(f)  # hashed before taking a transfer slot
+            with transfer(size_bytes) as t:
+                resp = s3.put_object(
+                    Bucket=self.bucket, Key=key, Body=t.body(f), ContentType=mime, Metadata=metadata or {},
+                    ContentLength=size_bytes, ContentMD5=md5,
+                )
+        return resp.get("ETag", "")
+
+    def put_stream(self, key, write, mime, metadata=None, part_size=16 * MB, max_concurrency=4):
+        return s3_stream_upload(
+            self.client, self.bucket, key, write, mime,
+            part_size=part_size, max_concurrency=max_concurrency, metadata=metadata,
+        )
+
+    def delete(self, key):
+        # S3 DeleteObject succeeds for missing keys
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def remote_digest(self, key):
+        try:
+            resp = self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            code = (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return (resp.get("Metadata") or {}).get("sha256", "")
+
+    def to_params(self):
+        return {"type": "s3", "bucket": self.bucket, "region": self.region}
+
+
+def _abort_s3_session(session):
+    # Abandoned resumable upload (see upload_journal.py)
+    get_s3_client(session.get("region") or "").abort_multipart_upload(
+        Bucket=session["bucket"], Key=session["key"], UploadId=session["upload_id"],
+    )
+
+
+register_aborter("s3", _abort_s3_session)
+
+
+# ---------- Azure ----------
+
+class AzureBackend(UploadBackend):
+    """
+    Auth priority:
+      1) connection_string
+      2) env AZURE_STORAGE_CONNECTION_STRING
+      3) account_name + account_key
+      4) env AZURE_STORAGE_ACCOUNT + AZURE_STORAGE_KEY
+
+    to_params (spooled jobs) never contains the secrets: node-input secrets are
+    referenced by `credential_ref` and recalled from memory when the job runs.
+    """
+    provider = "azure"
+
+    def __init__(self, container, connection_string="", account_name="", account_key="", credential_ref=""):
+        self.container = container
+        self.connection_string = connection_string or ""
+        self.account_name = account_name or ""
+        self.account_key = account_key or ""
+        self.credential_ref = credential_ref or ""
+        if self.credential_ref and not (self.connection_string or self.account_key):
+            self.connection_string, self.account_key = recall_credentials(self.credential_ref) or ("", "")
+
+    def _service(self):
+        if self.credential_ref and not (self.connection_string or self.account_key):
+            # Don't fall back to env credentials: they may belong to another account
+            raise ValueError(
+                "The Azure credentials of this queued job were node inputs, which are not written to disk. "
+                "Run an Azure node with the same credentials again, then retry the job."
+            )
+        return get_blob_service_client(self.connection_string, self.account_name, self.account_key)
+
+    def connect(self):
+        self._service()
+
+    @property
+    def container_client(self):
+        return self._service()[0].get_container_client(self.container)
+
+    def destination(self, key):
+        return f"{self.container_client.url}/{key}"
+
+    def url(self, key, use_signed_url=False, signed_expires=3600):
+        # public if container access level = Blob; otherwise use SAS
+        url = f"{self.container_client.url}/{key}"
+        if not use_signed_url:
+            return url
+
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        bsc, acct, secret = self._service()
+        if acct is None:
+            acct = bsc.account_name
+        if not secret:
+            secret = os.getenv("AZURE_STORAGE_KEY", "")
+        if not secret:
+            raise ValueError("AZURE_STORAGE_KEY required to generate SAS when use_signed_url=True.")
+        sas = generate_blob_sas(
+            account_name=acct,
+            container_name=self.container,
+            blob_name=key,
+            account_key=secret,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.utcnow() + timedelta(seconds=int(signed_expires)),
+        )
+        return f"{url}?{sas}"
+
+    def _upload(self, container_client, upload):
+        # container is created once per process, see cloud_clients.ensure_container
+        return upload_to_container(container_client, upload)
+
+    def put_bytes(self, key, data, mime, metadata=None):
+        from azure.storage.blob import ContentSettings
+
+        container_client = self.container_client
+
+        def do_upload():
+            with transfer(len(data)) as t:
+                resp = container_client.get_blob_client(key).upload_blob(
+                    t.body(data),
+                    length=len(data),
+                    overwrite=True,
+                    content_settings=ContentSettings(content_type=mime),
+                    metadata=metadata,
+                )
+            return resp.get("etag", "")
+
+        return self._upload(container_client, do_upload)
+
+    def put_file(self, key, file_path, mime, metadata=None, multipart=True, threshold=64 * MB,
+                 part_size=8 * MB, max_concurrency=4, resumable=True):
+        from azure.storage.blob import ContentSettings
+
+        container_client = self.container_client
+        size_bytes = os.path.getsize(file_path)
+
+        def do_upload():
+            if multipart and size_bytes >= threshold:
+                return azure_block_upload(
+                    container_client.get_blob_client(key), file_path, mime,
+                    block_size=part_size,
+                    max_concurrency=max_concurrency,
+                    journal=self._journal(key, file_path, part_size, resumable),
+                    metadata=metadata,
+                )
+            with transfer(size_bytes) as t, open(file_path, "rb") as f:
+                resp = container_client.get_blob_client(key).upload_blob(
+                    t.body(f),
+                    length=size_bytes,
+                    overwrite=True,
+                    content_settings=ContentSettings(content_type=mime),
+                    metadata=metadata,
+                )
+            return resp.get("etag", "")
+
+        return self._upload(container_client, do_upload)
+
+    def put_stream(self, key, write, mime, metadata=None, part_size=8 * MB, max_concurrency=4):
+        container_client = self.container_client
+
+        def do_upload():
+            return azure_stream_upload(
+                container_client.get_blob_client(key), write, mime,
+                block_size=part_size, max_concurrency=max_concurrency, metadata=metadata,
+            )
+
+        return self._upload(container_client, do_upload)
+
+    def delete(self, key):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            self.container_client.delete_blob(key)
+        except ResourceNotFoundError:
+            pass
+
+    def remote_digest(self, key):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            props = self.container_client.get_blob_client(key).get_blob_properties()
+        except ResourceNotFoundError:
+            return None
+        return (props.metadata or {}).get("sha256", "")
+
+    def to_params(self):
+        # No secrets on disk: node-input ones stay in memory under credential_ref,
+        # env credentials are resolved again when the job runs.
+        return {
+            "type": "azure", "container": self.container, "account_name": self.account_name,
+            "credential_ref": self.credential_ref or remember_credentials(self.connection_string, self.account_key),
+        }
+
+
+# ---------- local stand-in ----------
+
+class LocalBackend(UploadBackend):
+    """
+    Stores objects as files under `root/namespace/key`. URLs are
+    `base_url/namespace/key` when a base URL is set (e.g. a static file server
+    over `root`), file:// URLs otherwise. Metadata lives in `root/.meta`.
+    """
+    provider = "local"
+
+    def __init__(self, namespace, root=None, base_url=None):
+        self.namespace = namespace or "default"
+        self.root = root or LOCAL_UPLOAD_DIR
+        self.base_url = LOCAL_UPLOAD_URL if base_url is None else base_url
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, self.namespace, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Key escapes the upload directory: {key}")
+        return path
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, ".meta", self.namespace, key + ".json")
+
+    def destination(self, key):
+        return self._path(key)
+
+    def url(self, key, use_signed_url=False, signed_expires=3600):
+        if self.base_url:
+            return f"{self.base_url.rstrip('/')}/{self.namespace}/{key}"
+        return "file://" + self._path(key)
+
+    def _write(self, key, write, metadata):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = temp_path(path)  # skipped by the output sync until renamed
+        with open(tmp, "wb") as dst:
+            write(dst)
+        os.replace(tmp, path)
+
+        meta_path = self._meta_path(key)
+        if metadata:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+        elif os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        st = os.stat(path)
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+    def put_bytes(self, key, data, mime, metadata=None):
+        with transfer(len(data)) as t:
+            return self._write(key, lambda dst: shutil.copyfileobj(t.body(io.BytesIO(data)), dst, MB), metadata)
+
+    def put_file(self, key, file_path, mime, metadata=None, multipart=True, threshold=64 * MB,
+                 part_size=16 * MB, max_concurrency=4, resumable=True):
+        with transfer(os.path.getsize(file_path)) as t:
+            def copy(dst):
+                with open(file_path, "rb") as src:
+                    shutil.copyfileobj(t.body(src), dst, length=MB)
+
+            return self._write(key, copy, metadata)
+
+    def put_stream(self, key, write, mime, metadata=None, part_size=16 * MB, max_concurrency=4):
+        # Written straight to the temp file as it is produced (not throttled: the
+        # writer may be busy encoding for a long time and must not hold a transfer slot)
+        return self._write(key, write, metadata)
+
+    def delete(self, key):
+        for path in (self._path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def remote_digest(self, key):
+        if not os.path.isfile(self._path(key)):
+            return None
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                return json.load(f).get("sha256", "")
+        except FileNotFoundError:
+            return ""
+
+    def to_params(self):
+        return {"type": "local", "namespace": self.namespace, "root": self.root, "base_url": self.base_url}
+
+
+# ---------- factory ----------
+
+def backend_from_params(params):
+    params = dict(params)
+    kind = params.pop("type")
+    if kind == "s3":
+        return S3Backend(**params)
+    if kind == "azure":
+        return AzureBackend(**params)
+    if kind == "local":
+        return LocalBackend(**params)
+    raise ValueError(f"Unknown upload backend: {kind}")
+
+
+def local_override(namespace):
+    """LocalBackend for `namespace` when JLNODES_UPLOAD_BACKEND=local, else None."""
+    if os.getenv("JLNODES_UPLOAD_BACKEND", "").strip().lower() == "local":
+        return LocalBackend(namespace)
+    return None
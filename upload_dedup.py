@@ -0,0 +1,136 @@
+# upload_dedup.py
+"""
+Content-addressed dedup for the upload nodes.
+
+Payloads are hashed (sha256) while they are encoded/streamed; the digest can
+be used in key templates as {sha256} and is stored as object metadata. A local
+append-only index remembers which (provider, destination) already holds which
+digest so identical re-runs skip the transfer. Optionally a HEAD request
+confirms the remote object still exists (and catches objects uploaded by other
+workers), see UploadBackend.remote_digest.
+
+An entry found deleted remotely is forgotten with a tombstone record, so it
+stays forgotten after a restart. Once superseded records and tombstones
+outnumber the live entries, the index is rewritten with the live entries only.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from .upload_journal import STATE_DIR
+
+INDEX_PATH = os.path.join(STATE_DIR, "dedup_index.jsonl")
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_index = None  # "provider:destination" -> sha256
+_records = 0  # lines in the index file (live entries + superseded records + tombstones)
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(file_path, chunk_size=CHUNK_SIZE):
+    """Hash a file by streaming it in chunks (never the whole file in memory)."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load():
+    # Caller holds _lock.
+    global _index, _records
+    if _index is not None:
+        return _index
+    _index = {}
+    _records = 0
+    try:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn write
+                _records += 1
+                if rec.get("sha256"):
+                    _index[rec["k"]] = rec["sha256"]
+                else:
+                    _index.pop(rec["k"], None)  # tombstone
+    except FileNotFoundError:
+        pass
+    _maybe_compact()
+    return _index
+
+
+def _append(k, digest):
+    # Caller holds _lock. digest None = tombstone.
+    global _records
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    with open(INDEX_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"k": k, "sha256": digest}) + "\n")
+    _records += 1
+    _maybe_compact()
+
+
+def _maybe_compact():
+    # Caller holds _lock. Rewrite the index once dead records outnumber live entries.
+    global _records
+    if _records - len(_index) <= len(_index):
+        return
+    tmp = f"{INDEX_PATH}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for k, digest in _index.items():
+            f.write(json.dumps({"k": k, "sha256": digest}) + "\n")
+    os.replace(tmp, INDEX_PATH)
+    _records = len(_index)
+
+
+def is_known(provider, destination, digest):
+    with _lock:
+        return _load().get(f"{provider}:{destination}") == digest
+
+
+def mark_uploaded(provider, destination, digest):
+    k = f"{provider}:{destination}"
+    with _lock:
+        index = _load()
+        if index.get(k) == digest:
+            return
+        index[k] = digest
+        _append(k, digest)
+
+
+def forget(provider, destination):
+    """Drop the entry of `destination`, also from the index on disk (tombstone)."""
+    k = f"{provider}:{destination}"
+    with _lock:
+        if _load().pop(k, None) is not None:
+            _append(k, None)
+
+
+def already_uploaded(provider, destination, digest, remote_digest=None):
+    """
+    True if `destination` already holds `digest` and the upload can be skipped.
+
+    `remote_digest` is an optional HEAD check returning the remote object's
+    sha256 metadata: None if the object is missing, "" if it exists without
+    the metadata. Without it only the local index is consulted.
+    """
+    known = is_known(provider, destination, digest)
+    if remote_digest is None:
+        return known
+
+    remote = remote_digest()
+    if remote is None:
+        if known:
+            forget(provider, destination)  # deleted remotely: upload again
+        return False
+    if remote == digest or (known and remote == ""):
+        mark_uploaded(provider, destination, digest)
+        return True
+    return False
+
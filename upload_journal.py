@@ -0,0 +1,181 @@
+# upload_journal.py
+"""
+Local journal of in-progress multipart/block uploads, so an interrupted video
+upload resumes with only the missing parts after a restart.
+
+One append-only JSON-lines file per (provider, destination, file path, size,
+mtime). The first line holds the session (S3 bucket, key, region and upload
+id; part size), each following line one finished part. A changed file gets a
+different journal, so stale entries are never resumed; journals are deleted on
+completion and swept after JLNODES_JOURNAL_MAX_AGE seconds (default 7 days,
+the Azure lifetime of uncommitted blocks).
+
+A journal that is dropped before its upload completed (swept, a different
+part size, or superseded by a new upload to the same destination) is
+abandoned: the provider's registered aborter (register_aborter) ends the
+server-side session first, so S3 isn't left storing the parts of an
+incomplete multipart upload. Sessions that can't be aborted are logged with
+their upload id.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+STATE_DIR = os.getenv(
+    "JLNODES_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".state"),
+)
+JOURNAL_DIR = os.path.join(STATE_DIR, "journal")
+JOURNAL_MAX_AGE = float(os.getenv("JLNODES_JOURNAL_MAX_AGE", str(7 * 24 * 3600)))
+
+_aborters = {}  # provider -> fn(session) ending the server-side upload
+
+
+def register_aborter(provider, fn):
+    """Register how an abandoned `provider` session (the journal header's "session") is aborted."""
+    _aborters[provider] = fn
+
+
+def _abort_session(header):
+    # End the server-side upload of an abandoned journal; failures are logged, not raised.
+    session = header.get("session") or {}
+    if not session.get("upload_id"):
+        return
+    provider, destination = header.get("provider"), header.get("destination")
+    abort = _aborters.get(provider)
+    try:
+        if abort is None or not session.get("bucket"):
+            raise ValueError("no bucket/key recorded to abort it")
+        abort(session)
+        print(f"[UploadJournal] Aborted abandoned {provider} upload {session['upload_id']} of {destination}")
+    except Exception as e:
+        print(f"[UploadJournal] Orphaned {provider} upload {session['upload_id']} of {destination} "
+              f"(left to the bucket's lifecycle rule): {e}")
+
+
+def _read_header(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(f.readline())
+
+
+class UploadJournal:
+    def __init__(self, provider, destination, file_path, part_size):
+        st = os.stat(file_path)
+        ident = "\0".join([provider, destination, os.path.abspath(file_path), str(st.st_size), str(st.st_mtime_ns)])
+        self.path = os.path.join(JOURNAL_DIR, hashlib.sha256(ident.encode("utf-8")).hexdigest()[:32] + ".jsonl")
+        self.provider = provider
+        self.destination = destination
+        self.part_size = int(part_size)
+        self.session = None  # e.g. {"upload_id": ...}
+        self.parts = {}      # part number -> etag / block id
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read a previous session for this exact file. Returns True if there is one to resume."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return False
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break  # torn write at the tail: keep what we have
+        if not records or records[0].get("part_size") != self.part_size:
+            if records:
+                _abort_session(records[0])
+            self.discard()
+            return False
+
+        self.session = records[0].get("session") or {}
+        self.parts = {int(r["part"]): r["value"] for r in records[1:] if "part" in r}
+        return True
+
+    def start(self, **session):
+        """
+        Begin a new session, replacing any previous journal for this destination
+        (this file's, or one of an earlier version of the file: those are abandoned).
+        """
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        self._abandon_others()
+        header = {
+            "provider": self.provider,
+            "destination": self.destination,
+            "part_size": self.part_size,
+            "session": session,
+            "created": time.time(),
+        }
+        with self._lock:
+            self.session = session
+            self.parts = {}
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(header) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record(self, part, value):
+        """Mark one part as uploaded (thread-safe, durable before returning)."""
+        line = json.dumps({"part": int(part), "value": value}) + "\n"
+        with self._lock:
+            self.parts[int(part)] = value
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _abandon_others(self):
+        for entry in list(os.scandir(JOURNAL_DIR)):
+            if not entry.name.endswith(".jsonl") or entry.path == self.path:
+                continue
+            try:
+                header = _read_header(entry.path)
+            except (OSError, ValueError):
+                continue
+            if header.get("provider") == self.provider and header.get("destination") == self.destination:
+                _abort_session(header)
+                _remove(entry.path)
+
+    def discard(self):
+        """Drop the journal (upload completed or aborted)."""
+        with self._lock:
+            self.session = None
+            self.parts = {}
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def gc_journals(max_age=JOURNAL_MAX_AGE):
+    """Abort and delete journals untouched for longer than `max_age` seconds."""
+    try:
+        entries = list(os.scandir(JOURNAL_DIR))
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in entries:
+        try:
+            if not entry.name.endswith(".jsonl") or entry.stat().st_mtime >= cutoff:
+                continue
+            try:
+                _abort_session(_read_header(entry.path))
+            except ValueError:
+                pass  # torn header: nothing to abort
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,237 @@
+# upload_limits.py
+"""
+Process-wide limits shared by every cloud upload (all nodes, the background
+queue, multipart parts and Azure blocks):
+
+  JLNODES_MAX_TRANSFERS         max requests sending data at once (0 = unlimited)
+  JLNODES_UPLOAD_BYTES_PER_SEC  token-bucket bandwidth cap (0 = unlimited)
+  JLNODES_UPLOAD_BURST_BYTES    bucket size (default: one second of bandwidth, at least 1 MiB)
+  JLNODES_SMALL_TRANSFER_BYTES  requests up to this size (default 8 MiB, i.e. images)
+                                go ahead of larger ones (video parts) when waiting
+
+Each request that carries data (a PUT, an S3 part, an Azure block) runs inside
+`with transfer(nbytes) as t:` and sends `t.body(data)`: a reader that pays for
+the bytes from the bucket as the HTTP client reads them, chunk by chunk, so
+the body really leaves at the capped rate (no part-sized bursts) and small
+requests' chunks are paid ahead of large ones'. With JLNODES_MAX_TRANSFERS of
+2 or more, large requests (throttled video parts) may only hold all but one
+slot, so an image never waits for a slot behind them.
+
+Limits are per process: with several ComfyUI workers on one box, give each a
+share of the link.
+"""
+import heapq
+import io
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+MAX_TRANSFERS = int(os.getenv("JLNODES_MAX_TRANSFERS", "0"))
+BYTES_PER_SEC = float(os.getenv("JLNODES_UPLOAD_BYTES_PER_SEC", "0"))
+BURST_BYTES = float(os.getenv("JLNODES_UPLOAD_BURST_BYTES", "0")) or max(float(MB), BYTES_PER_SEC)
+SMALL_TRANSFER_BYTES = int(os.getenv("JLNODES_SMALL_TRANSFER_BYTES", str(8 * MB)))
+
+PRIORITY_SMALL = 0
+PRIORITY_LARGE = 1
+
+
+class _PriorityGate:
+    """Waiters are served in (priority, arrival) order."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+
+    def _wait_turn(self, priority, ready, timeout_fn=None):
+        # Caller holds _cond. Blocks until this waiter is first in line and ready().
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._waiters, entry)
+        try:
+            while self._waiters[0] != entry or not ready():
+                self._cond.wait(timeout_fn() if timeout_fn else None)
+        finally:
+            self._remove(entry)
+            self._cond.notify_all()
+
+    def _remove(self, entry):
+        if self._waiters[0] == entry:
+            heapq.heappop(self._waiters)
+        else:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+
+class TransferSlots(_PriorityGate):
+    """
+    Counting semaphore that hands free slots to small transfers first and keeps
+    one slot (of two or more) for them.
+    """
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.active = 0
+        self.waited = 0
+
+    def _limit_for(self, priority):
+        if priority == PRIORITY_SMALL or self.limit < 2:
+            return self.limit
+        return self.limit - 1
+
+    def acquire(self, priority):
+        limit = self._limit_for(priority)
+        with self._cond:
+            if not self._waiters and self.active < limit:
+                self.active += 1
+                return
+            self.waited += 1
+            self._wait_turn(priority, lambda: self.active < limit)
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class TokenBucket(_PriorityGate):
+    """Bytes-per-second limiter; requests larger than the bucket pay chunk by chunk."""
+
+    def __init__(self, rate, capacity):
+        super().__init__()
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.throttled_seconds = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def consume(self, nbytes, priority):
+        start = time.monotonic()
+        remaining = float(nbytes)
+        while remaining > 0:
+            chunk = min(remaining, self.capacity)
+            with self._cond:
+                def ready():
+                    self._refill()
+                    return self.tokens >= chunk
+
+                def until_ready():
+                    return max(0.001, (chunk - self.tokens) / self.rate)
+
+                self._wait_turn(priority, ready, until_ready)
+                self.tokens -= chunk
+            remaining -= chunk
+        with self._cond:
+            self.throttled_seconds += time.monotonic() - start
+
+
+_slots = TransferSlots(MAX_TRANSFERS) if MAX_TRANSFERS > 0 else None
+_bucket = TokenBucket(BYTES_PER_SEC, BURST_BYTES) if BYTES_PER_SEC > 0 else None
+
+
+def priority_for(nbytes):
+    return PRIORITY_SMALL if nbytes <= SMALL_TRANSFER_BYTES else PRIORITY_LARGE
+
+
+class _ThrottledReader:
+    """
+    File wrapper that pays for every read from the bucket before handing the
+    bytes to the HTTP client. The SDKs read each body once (the S3 client runs
+    without checksum or payload-signing passes, see cloud_clients.get_s3_client),
+    so a body costs its size; a retried request re-reads and is paid again,
+    since it is sent again.
+    """
+
+    def __init__(self, raw, priority):
+        self._raw = raw
+        self._priority = priority
+
+    def read(self, size=-1):
+        data = self._raw.read(size)
+        if data:
+            _bucket.consume(len(data), self._priority)
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._raw.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._raw.seek(offset, whence)
+
+    def tell(self):
+        return self._raw.tell()
+
+    def close(self):
+        pass  # the caller owns the underlying file
+
+
+class _Transfer:
+    def __init__(self, priority):
+        self.priority = priority
+
+    def body(self, data):
+        """`data` (bytes or a file object) as a request body paced to the bandwidth cap."""
+        if _bucket is None:
+            return data
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = io.BytesIO(data)
+        return _ThrottledReader(data, self.priority)
+
+
+@contextmanager
+def _limited(nbytes):
+    handle = _Transfer(priority_for(nbytes))
+    if _slots is not None:
+        _slots.acquire(handle.priority)
+    try:
+        yield handle
+    finally:
+        if _slots is not None:
+            _slots.release()
+
+
+class _Unlimited:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def body(self, data):
+        return data
+
+
+_UNLIMITED = _Unlimited()
+
+
+def transfer(nbytes):
+    """
+    Context manager around one request sending `nbytes` (no-op when no limit is
+    configured). Send the body as `t.body(data)` so it is paced to the cap.
+    """
+    if _slots is None and _bucket is None:
+        return _UNLIMITED
+    return _limited(nbytes)
+
+
+def limits_status():
+    return {
+        "max_transfers": MAX_TRANSFERS,
+        "active_transfers": _slots.active if _slots else None,
+        "slot_waits": _slots.waited if _slots else 0,
+        "bytes_per_sec": BYTES_PER_SEC,
+        "throttled_seconds": round(_bucket.throttled_seconds, 3) if _bucket else 0.0,
+    }
@@ -0,0 +1,192 @@
+# upload_metrics.py
+"""
+Per-stage timing and byte counters for the upload nodes.
+
+A node run creates one UploadMetrics (start_metrics) and the pipeline wraps
+each stage in `metrics.stage(name, nbytes)`:
+
+  client    building / fetching the pooled S3 or Azure client
+  encode    IMAGE tensor -> PNG/JPEG/WebP bytes (bytes = encoded size)
+  hash      sha256 for dedup / {sha256} keys (bytes hashed)
+  sign      public URL, presigned URL or SAS
+  dedup     dedup index / HEAD check
+  upload    the PUT / multipart / block transfer (bytes sent)
+  queue     spooling the job for async_upload (bytes spooled)
+  callback  callback dispatch (a sync POST, or just the hand-off otherwise)
+
+Stages are timed with time.perf_counter and may run on several threads
+(frames of a batch). finish() returns the run as JSON and adds it to
+process-wide counters, which are written in Prometheus text format to
+JLNODES_METRICS_FILE (default <state dir>/metrics/jlnodes_uploads.prom)
+for the node_exporter textfile collector.
+
+Disabled runs (the default) get NULL_METRICS, whose stage() is a shared
+no-op context manager, so the pipeline pays a method call per stage and nothing else.
+Enable per node (`collect_metrics` input) or for every node with JLNODES_METRICS=1.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .upload_journal import STATE_DIR
+
+ENABLED = os.getenv("JLNODES_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+METRICS_FILE = os.getenv("JLNODES_METRICS_FILE", os.path.join(STATE_DIR, "metrics", "jlnodes_uploads.prom"))
+
+_lock = threading.Lock()
+_totals = {}  # (node, stage) -> [seconds, calls, bytes]
+_runs = {}    # node -> [runs, seconds, last_run_seconds]
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullMetrics:
+    enabled = False
+
+    def stage(self, name, nbytes=0):
+        return _NULL_STAGE
+
+    def add_bytes(self, name, nbytes):
+        pass
+
+    def finish(self):
+        return ""
+
+
+NULL_METRICS = NullMetrics()
+
+
+class UploadMetrics:
+    enabled = True
+
+    def __init__(self, source):
+        self.source = source
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> [seconds, calls, bytes]
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, nbytes=0):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._add(name, time.perf_counter() - start, 1, nbytes)
+
+    def add_bytes(self, name, nbytes):
+        """Count bytes against a stage when the size is only known after it ran."""
+        self._add(name, 0.0, 0, nbytes)
+
+    def _add(self, name, seconds, calls, nbytes):
+        with self._lock:
+            entry = self._stages.setdefault(name, [0.0, 0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+            entry[2] += nbytes
+
+    def to_dict(self, wall_seconds=None):
+        with self._lock:
+            stages = {
+                name: {"seconds": round(s, 6), "calls": c, "bytes": b}
+                for name, (s, c, b) in self._stages.items()
+            }
+        if wall_seconds is None:
+            wall_seconds = time.perf_counter() - self._start
+        # Stages of parallel frames overlap, so their sum can exceed the wall time
+        return {"node": self.source, "wall_seconds": round(wall_seconds, 6), "stages": stages}
+
+    def finish(self):
+        """Record the run in the process totals, rewrite the metrics file, return the run as JSON."""
+        wall_seconds = time.perf_counter() - self._start
+        report = self.to_dict(wall_seconds)
+        with _lock:
+            for name, stage in report["stages"].items():
+                entry = _totals.setdefault((self.source, name), [0.0, 0, 0])
+                entry[0] += stage["seconds"]
+                entry[1] += stage["calls"]
+                entry[2] += stage["bytes"]
+            runs = _runs.setdefault(self.source, [0, 0.0, 0.0])
+            runs[0] += 1
+            runs[1] += wall_seconds
+            runs[2] = wall_seconds
+            _write_prometheus()
+        return json.dumps(report)
+
+
+def start_metrics(source, enabled=None):
+    """UploadMetrics for a node run, or NULL_METRICS when disabled (`enabled` None -> JLNODES_METRICS)."""
+    if enabled or (enabled is None and ENABLED):
+        return UploadMetrics(source)
+    return NULL_METRICS
+
+
+# ---------- Prometheus text format ----------
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus():
+    # Caller holds _lock.
+    lines = [
+        "# HELP jlnodes_upload_stage_seconds_total Time spent per upload stage.",
+        "# TYPE jlnodes_upload_stage_seconds_total counter",
+    ]
+    for (node, stage), (seconds, _, _) in sorted(_totals.items()):
+        lines.append(f'jlnodes_upload_stage_seconds_total{{node="{_label(node)}",stage="{_label(stage)}"}} {seconds:.6f}')
+    lines += [
+        "# HELP jlnodes_upload_stage_calls_total Executions per upload stage.",
+        "# TYPE jlnodes_upload_stage_calls_total counter",
+    ]
+    for (node, stage), (_, calls, _) in sorted(_totals.items()):
+        lines.append(f'jlnodes_upload_stage_calls_total{{node="{_label(node)}",stage="{_label(stage)}"}} {calls}')
+    lines += [
+        "# HELP jlnodes_upload_stage_bytes_total Bytes processed per upload stage.",
+        "# TYPE jlnodes_upload_stage_bytes_total counter",
+    ]
+    for (node, stage), (_, _, nbytes) in sorted(_totals.items()):
+        lines.append(f'jlnodes_upload_stage_bytes_total{{node="{_label(node)}",stage="{_label(stage)}"}} {nbytes}')
+    lines += [
+        "# HELP jlnodes_upload_runs_total Instrumented node runs.",
+        "# TYPE jlnodes_upload_runs_total counter",
+    ]
+    for node, (runs, _, _) in sorted(_runs.items()):
+        lines.append(f'jlnodes_upload_runs_total{{node="{_label(node)}"}} {runs}')
+    lines += [
+        "# HELP jlnodes_upload_run_seconds_total Wall time of instrumented node runs.",
+        "# TYPE jlnodes_upload_run_seconds_total counter",
+    ]
+    for node, (_, seconds, _) in sorted(_runs.items()):
+        lines.append(f'jlnodes_upload_run_seconds_total{{node="{_label(node)}"}} {seconds:.6f}')
+    lines += [
+        "# HELP jlnodes_upload_last_run_seconds Wall time of the latest instrumented run.",
+        "# TYPE jlnodes_upload_last_run_seconds gauge",
+    ]
+    for node, (_, _, last) in sorted(_runs.items()):
+        lines.append(f'jlnodes_upload_last_run_seconds{{node="{_label(node)}"}} {last:.6f}')
+    return "\n".join(lines) + "\n"
+
+
+def _write_prometheus():
+    # Caller holds _lock. Write + rename so a scrape never sees a partial file.
+    if not METRICS_FILE:
+        return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(METRICS_FILE)), exist_ok=True)
+        tmp = f"{METRICS_FILE}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        os.replace(tmp, METRICS_FILE)
+    except OSError as e:
+        print(f"[upload_metrics] Could not write {METRICS_FILE}: {e}")
@@ -0,0 +1,485 @@
+# upload_pipeline.py
+"""
+One upload pipeline shared by the cloud nodes. The nodes are thin front-ends
+that build an UploadBackend (upload_backends.py) from their inputs and call:
+
+  upload_image_batch  IMAGE batch -> encoded frames -> one object per frame
+  upload_image_fanout same, encoded once and uploaded to several backends
+  upload_image_archive IMAGE batch -> encoded frames -> one streamed tar / zip object
+  upload_local_file   local file (e.g. a VHS video) -> one streamed object
+  upload_local_files  several local files (e.g. all VHS outputs) -> one object each,
+                      uploaded concurrently, one aggregated callback
+
+Both share key templating, URL building, dedup, async queueing and callbacks:
+  {timestamp} {index} {basename} {sha256}  key template placeholders
+  dedup / dedup_verify_remote              see upload_dedup.py
+  async_upload                             see upload_queue.py
+  callback_mode                            see callbacks.py
+  metrics                                  per-stage timings, see upload_metrics.py
+"""
+import mimetypes
+import os
+import posixpath
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .callbacks import send_callback
+from .cloud_transfer import MB
+from .image_archive import ARCHIVE_FORMATS, archive_key_template, write_archive
+from .image_encoding import batch_indices, encode_image, indexed_template, resolve_format
+from .upload_backends import backend_from_params
+from .upload_dedup import already_uploaded, mark_uploaded, sha256_bytes, sha256_file
+from .upload_metrics import NULL_METRICS, start_metrics
+from .upload_queue import enqueue, register_handler
+
+MAX_PARALLEL_FILES = 8
+
+
+def render_key(template, **values):
+    for name, value in values.items():
+        template = template.replace("{%s}" % name, str(value))
+    return template
+
+
+def pick_path_from_vhs(vhs_filenames, prefer_index=-1, source="JLNodes"):
+    # Expected VHS structure: (save_output:boolean, [png_path, mp4_path, ...])
+    try:
+        if isinstance(vhs_filenames, (list, tuple)) and len(vhs_filenames) >= 2:
+            paths = vhs_filenames[1]
+            if isinstance(paths, (list, tuple)) and len(paths) > 0:
+                return str(paths[prefer_index])
+    except Exception as e:
+        print(f"[{source}] Could not parse VHS_FILENAMES: {e}")
+    return None
+
+
+def select_vhs_paths(vhs_filenames, indices="", extensions="", source="JLNodes"):
+    """
+    Paths of a VHS_FILENAMES output to upload in multi-file mode: the entries at
+    `indices` ("0,-1") and/or with one of `extensions` (".png,.mp4"); all when both are empty.
+    """
+    try:
+        paths = [str(p) for p in vhs_filenames[1]]
+    except Exception as e:
+        print(f"[{source}] Could not parse VHS_FILENAMES: {e}")
+        return []
+
+    if indices.strip():
+        picked = []
+        for part in indices.split(","):
+            try:
+                picked.append(paths[int(part)])
+            except (ValueError, IndexError):
+                print(f"[{source}] Ignoring VHS index '{part.strip()}' ({len(paths)} files)")
+        paths = picked
+    exts = tuple("." + e.strip().lower().lstrip(".") for e in extensions.split(",") if e.strip())
+    if exts:
+        paths = [p for p in paths if p.lower().endswith(exts)]
+    return list(dict.fromkeys(paths))  # drop duplicates, keep order
+
+
+def transfer_options(multipart=True, threshold_mb=64, part_size_mb=16, max_concurrency=4, resumable=True):
+    """Streaming options for UploadBackend.put_file, from node inputs in MB."""
+    return {
+        "multipart": bool(multipart),
+        "threshold": int(threshold_mb) * MB,
+        "part_size": int(part_size_mb) * MB,
+        "max_concurrency": int(max_concurrency),
+        "resumable": bool(resumable),
+    }
+
+
+# ---------- delivery ----------
+
+def _is_duplicate(backend, key, digest, dedup_verify_remote=False, metrics=NULL_METRICS):
+    # Skip identical bytes already stored at this key
+    with metrics.stage("dedup"):
+        return already_uploaded(
+            backend.provider, backend.destination(key), digest,
+            (lambda: backend.remote_digest(key)) if dedup_verify_remote else None,
+        )
+
+
+def _job(key, mime, digest, dedup, transfer=None, file_path=None):
+    # What _put needs; plain data so it can be spooled for async_upload
+    return {
+        "key": key, "mime": mime, "sha256": digest if dedup else "",
+        "transfer": transfer or {}, "file_path": file_path,
+    }
+
+
+def _deliver(backend, key, mime, callback_json, data=None, file_path=None, digest="", transfer=None,
+             dedup=False, dedup_verify_remote=False, async_upload=False,
+             callback_url="", callback_mode=None, source="JLNodes", metrics=NULL_METRICS):
+    """Dedup check, then queue or upload `data` / `file_path` to `key`, then callback."""
+    if dedup and _is_duplicate(backend, key, digest, dedup_verify_remote, metrics):
+        with metrics.stage("callback"):
+            send_callback(callback_url, dict(callback_json, deduplicated=True), callback_mode, source=source)
+        return "deduplicated"
+
+    params = dict(
+        _job(key, mime, digest, dedup, transfer, file_path),
+        backend=backend.to_params(), source=source,
+        callback_url=callback_url, callback_mode=callback_mode, callback_json=callback_json,
+        metrics=metrics.enabled,
+    )
+
+    # Hand off to the background queue
+    if async_upload:
+        with metrics.stage("queue", len(data) if data is not None else 0):
+            enqueue("upload", params, data)
+        return "queued"
+
+    _put(backend, params, data=data, metrics=metrics)
+    with metrics.stage("callback"):
+        send_callback(callback_url, callback_json, callback_mode, source=source)
+    return "uploaded"
+
+
+def _put(backend, params, data=None, payload_path=None, metrics=NULL_METRICS):
+    key, mime, digest = params["key"], params["mime"], params["sha256"]
+    metadata = {"sha256": digest} if digest else None
+    if data is not None:
+        with metrics.stage("upload", len(data)):
+            backend.put_bytes(key, data, mime, metadata)
+    else:
+        file_path = payload_path or params["file_path"]
+        with metrics.stage("upload", os.path.getsize(file_path)):
+            backend.put_file(key, file_path, mime, metadata, **params["transfer"])
+    if digest:
+        mark_uploaded(backend.provider, backend.destination(key), digest)
+
+
+def _run_queued_upload(params, payload_path):
+    # Background worker side of async_upload (see upload_queue.py)
+    metrics = start_metrics(f"{params['source']} (queued)", params.get("metrics", False))
+    backend = backend_from_params(params["backend"])
+    with metrics.stage("client"):
+        backend.connect()
+    _put(backend, params, payload_path=payload_path, metrics=metrics)
+    with metrics.stage("callback"):
+        send_callback(params["callback_url"], params["callback_json"], params["callback_mode"], source=params["source"])
+    metrics.finish()
+
+
+def _run_queued_batch(params, payload_path):
+    # Background side of a multi-file async_upload: every file, then one callback
+    metrics = start_metrics(f"{params['source']} (queued)", params.get("metrics", False))
+    backend = backend_from_params(params["backend"])
+    with metrics.stage("client"):
+        backend.connect()
+    jobs = params["jobs"]
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_FILES, len(jobs)))) as pool:
+        list(pool.map(lambda job: _put(backend, job, metrics=metrics), jobs))
+    callback_json = params["callback_json"]
+    for entry in callback_json["files"]:
+        if entry["status"] == "queued":
+            entry["status"] = "uploaded"
+    with metrics.stage("callback"):
+        send_callback(params["callback_url"], callback_json, params["callback_mode"], source=params["source"])
+    metrics.finish()
+
+
+register_handler("upload", _run_queued_upload)
+register_handler("upload_batch", _run_queued_batch)
+
+
+# ---------- front-end entry points ----------
+
+def _encode_frame(image, i, template, image_format, quality, compress_level, dedup, metrics=NULL_METRICS):
+    # Convert image tensor → encoded bytes (+ sha256 when dedup or the key needs it)
+    with metrics.stage("encode"):
+        data = encode_image(image[i], image_format, quality, compress_level)
+    metrics.add_bytes("encode", len(data))
+    digest = ""
+    if dedup or "{sha256}" in template:
+        with metrics.stage("hash", len(data)):
+            digest = sha256_bytes(data)
+    return data, digest
+
+
+def _deliver_frame(backend, i, data, digest, template, timestamp, mime, use_signed_url, signed_expires,
+                   dedup, dedup_verify_remote, async_upload, callback_url, callback_mode, source, metrics):
+    key = render_key(template, timestamp=timestamp, index=i, sha256=digest)
+    with metrics.stage("sign"):
+        url = backend.url(key, use_signed_url, signed_expires)
+    callback_json = {
+        "url": url, "path": key, "provider": backend.provider,
+        "mime": mime, "size_bytes": len(data), "index": i,
+    }
+    _deliver(
+        backend, key, mime, callback_json, data=data, digest=digest,
+        dedup=dedup, dedup_verify_remote=dedup_verify_remote, async_upload=async_upload,
+        callback_url=callback_url, callback_mode=callback_mode, source=source, metrics=metrics,
+    )
+    return url
+
+
+def upload_image_batch(backend, image, key_template, mime, use_signed_url=False, signed_expires=3600,
+                       batch_mode=True, max_workers=4, image_format="png", quality=90, compress_level=6,
+                       dedup=False, dedup_verify_remote=False, async_upload=False,
+                       callback_url="", callback_mode=None, source="JLNodes", metrics=NULL_METRICS):
+    """Encode and upload every frame of `image` concurrently. Returns the URLs in batch order."""
+    timestamp = str(int(time.time()))
+    indices = batch_indices(image, batch_mode)
+    key_template, mime = resolve_format(image_format, key_template, mime)
+    template = indexed_template(key_template, len(indices))
+    with metrics.stage("client"):
+        backend.connect()
+
+    def upload_one(i):
+        data, digest = _encode_frame(image, i, template, image_format, quality, compress_level, dedup, metrics)
+        return _deliver_frame(
+            backend, i, data, digest, template, timestamp, mime, use_signed_url, signed_expires,
+            dedup, dedup_verify_remote, async_upload, callback_url, callback_mode, source, metrics,
+        )
+
+    # Encode + upload frames concurrently, URLs stay in batch order
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(indices)))) as pool:
+        return list(pool.map(upload_one, indices))
+
+
+def upload_image_fanout(backends, image, key_template, mime, use_signed_url=False, signed_expires=3600,
+                        batch_mode=True, max_workers=4, image_format="png", quality=90, compress_level=6,
+                        dedup=False, dedup_verify_remote=False, async_upload=False,
+                        callback_url="", callback_mode=None, source="JLNodes", metrics=NULL_METRICS):
+    """
+    Encode every frame once and upload it to each of `backends` ({name: UploadBackend})
+    concurrently. A failing destination does not stop the others; returns
+    {name: {"status": "ok" | "error", "urls": [...], "errors": [...]}} with "" for failed frames.
+    """
+    timestamp = str(int(time.time()))
+    indices = batch_indices(image, batch_mode)
+    key_template, mime = resolve_format(image_format, key_template, mime)
+    template = indexed_template(key_template, len(indices))
+    results = {name: {"status": "ok", "urls": [""] * len(indices), "errors": []} for name in backends}
+
+    def fail(name, error, index=None):
+        where = f" (frame {index})" if index is not None else ""
+        print(f"[{source}] Upload to {name} failed{where}: {error}")
+        results[name]["status"] = "error"
+        results[name]["errors"].append({"index": index, "error": str(error)})
+
+    live = {}
+    for name, backend in backends.items():
+        try:
+            with metrics.stage("client"):
+                backend.connect()
+            live[name] = backend
+        except Exception as e:
+            fail(name, e)
+
+    def encode_one(i):
+        return (i,) + _encode_frame(image, i, template, image_format, quality, compress_level, dedup, metrics)
+
+    workers = max(1, min(int(max_workers), len(indices)))
+    with ThreadPoolExecutor(max_workers=workers) as encoders, \
+            ThreadPoolExecutor(max_workers=max(1, workers * len(live))) as uploaders:
+        # Uploads of a frame start as soon as it is encoded
+        pending = []
+        for i, data, digest in encoders.map(encode_one, indices):
+            for name, backend in live.items():
+                future = uploaders.submit(
+                    _deliver_frame, backend, i, data, digest, template, timestamp, mime,
+                    use_signed_url, signed_expires, dedup, dedup_verify_remote, async_upload,
+                    callback_url, callback_mode, source, metrics,
+                )
+                pending.append((name, i, future))
+
+        for name, i, future in pending:
+            try:
+                results[name]["urls"][indices.index(i)] = future.result()
+            except Exception as e:
+                fail(name, e, i)
+    return results
+
+
+def upload_image_archive(backend, image, key_template, member_template, archive_format="tar", use_signed_url=False,
+                         signed_expires=3600, batch_mode=True, max_workers=4, image_format="png", quality=90,
+                         compress_level=6, part_size=16 * MB, max_concurrency=4,
+                         callback_url="", callback_mode=None, source="JLNodes", metrics=NULL_METRICS):
+    """
+    Encode the frames of `image` in parallel and stream them, in batch order,
+    into one tar / zip object uploaded part by part while it is written.
+    Member names come from `member_template` ({index} zero-padded, {timestamp},
+    {sha256}). Returns the archive's URL.
+    """
+    if "{sha256}" in key_template:
+        raise ValueError("{sha256} is not available in the key of a streamed archive")
+    timestamp = str(int(time.time()))
+    indices = batch_indices(image, batch_mode)
+    member_template, _ = resolve_format(image_format, member_template, "")
+    member_template = indexed_template(member_template, len(indices))
+    width = max(5, len(str(indices[-1])))
+    key = render_key(archive_key_template(key_template, archive_format), timestamp=timestamp, index="")
+    mime = ARCHIVE_FORMATS[archive_format][0]
+    workers = max(1, min(int(max_workers), len(indices)))
+    names = []
+
+    def members():
+        # Encode ahead of the writer, but only a bounded window of frames
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            window = deque()
+            for i in indices:
+                window.append((i, pool.submit(
+                    _encode_frame, image, i, member_template, image_format, quality, compress_level, False, metrics,
+                )))
+                if len(window) > 2 * workers:
+                    yield member(*window.popleft())
+            while window:
+                yield member(*window.popleft())
+
+    def member(i, future):
+        data, digest = future.result()
+        name = render_key(member_template, timestamp=timestamp, index=f"{i:0{width}d}", sha256=digest)
+        names.append(name)
+        return name, data
+
+    def write(fileobj):
+        write.size = write_archive(fileobj, archive_format, members(), mtime=int(timestamp))
+
+    with metrics.stage("client"):
+        backend.connect()
+    # Encoding overlaps the upload, so the "upload" stage covers both
+    with metrics.stage("upload"):
+        backend.put_stream(key, write, mime, part_size=part_size, max_concurrency=max_concurrency)
+    metrics.add_bytes("upload", write.size)
+
+    with metrics.stage("sign"):
+        url = backend.url(key, use_signed_url, signed_expires)
+    callback_json = {
+        "url": url, "path": key, "provider": backend.provider, "mime": mime,
+        "size_bytes": write.size, "archive_format": archive_format, "members": names,
+    }
+    with metrics.stage("callback"):
+        send_callback(callback_url, callback_json, callback_mode, source=source)
+    return url
+
+
+def upload_local_file(backend, file_path, key_template, mime, use_signed_url=False, signed_expires=3600,
+                      transfer=None, dedup=False, dedup_verify_remote=False, async_upload=False,
+                      callback_url="", callback_mode=None, source="JLNodes", metrics=NULL_METRICS):
+    """Stream a local file to the backend. Returns its URL, or "" if the file does not exist."""
+    file_path = (file_path or "").strip()
+    if not os.path.isfile(file_path):
+        print(f"[{source}] File not found: {file_path}")
+        return ""
+
+    basename = os.path.basename(file_path)
+    size_bytes = os.path.getsize(file_path)
+    with metrics.stage("client"):
+        backend.connect()
+    digest = ""
+    if dedup or "{sha256}" in key_template:
+        with metrics.stage("hash", size_bytes):
+            digest = sha256_file(file_path)
+    key = render_key(key_template, basename=basename, timestamp=str(int(time.time())), sha256=digest)
+
+    # Signing is local, so the URL is known before the transfer
+    with metrics.stage("sign"):
+        url = backend.url(key, use_signed_url, signed_expires)
+    callback_json = {
+        "url": url, "path": key, "provider": backend.provider,
+        "mime": mime, "size_bytes": size_bytes,
+    }
+
+    # async jobs reference the file, so it must stay on disk until uploaded
+    status = _deliver(
+        backend, key, mime, callback_json, file_path=os.path.abspath(file_path), digest=digest,
+        transfer=transfer, dedup=dedup, dedup_verify_remote=dedup_verify_remote, async_upload=async_upload,
+        callback_url=callback_url, callback_mode=callback_mode, source=source, metrics=metrics,
+    )
+    print(f"[{source}] {status.capitalize()} {basename} -> {url}")
+    return url
+
+
+def upload_local_files(backend, file_paths, key_template, mime, use_signed_url=False, signed_expires=3600,
+                       transfer=None, dedup=False, dedup_verify_remote=False, async_upload=False,
+                       callback_url="", callback_mode=None, source="JLNodes", metrics=NULL_METRICS):
+    """
+    Upload several local files concurrently through one backend and send one
+    aggregated callback ({"files": [...]}). Returns {local path: url}.
+
+    A file that fails is reported in its callback entry ({"status": "error",
+    "error": ...}) without stopping the others; after the callback has been sent
+    (or queued), the failures are raised together as one RuntimeError.
+
+    Each file's mime is guessed from its extension (`mime` is the fallback), and a
+    template without {basename} gets it as the last path segment so keys don't collide.
+    """
+    file_paths = [p for p in (p.strip() for p in file_paths) if p]
+    missing = [p for p in file_paths if not os.path.isfile(p)]
+    for p in missing:
+        print(f"[{source}] File not found: {p}")
+    file_paths = [p for p in file_paths if p not in missing]
+    if not file_paths:
+        return {}
+
+    if "{basename}" not in key_template and len(file_paths) > 1:
+        key_template = posixpath.join(posixpath.dirname(key_template), "{basename}")
+    timestamp = str(int(time.time()))
+    with metrics.stage("client"):
+        backend.connect()
+
+    def prepare(file_path):
+        basename = os.path.basename(file_path)
+        file_mime = mimetypes.guess_type(basename)[0] or mime
+        entry = {
+            "url": "", "path": "", "provider": backend.provider,
+            "mime": file_mime, "size_bytes": 0, "local_path": file_path,
+        }
+        job = None
+        try:
+            entry["size_bytes"] = size_bytes = os.path.getsize(file_path)
+            digest = ""
+            if dedup or "{sha256}" in key_template:
+                with metrics.stage("hash", size_bytes):
+                    digest = sha256_file(file_path)
+            key = entry["path"] = render_key(key_template, basename=basename, timestamp=timestamp, sha256=digest)
+            with metrics.stage("sign"):
+                entry["url"] = backend.url(key, use_signed_url, signed_expires)
+            job = _job(key, file_mime, digest, dedup, transfer, os.path.abspath(file_path))
+
+            if dedup and _is_duplicate(backend, key, digest, dedup_verify_remote, metrics):
+                entry["status"] = "deduplicated"
+            elif async_upload:
+                entry["status"] = "queued"
+            else:
+                _put(backend, job, metrics=metrics)
+                entry["status"] = "uploaded"
+        except Exception as e:
+            # Reported in the aggregated callback; the other files go on
+            entry["status"] = "error"
+            entry["error"] = str(e)
+        return entry, job
+
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_FILES, len(file_paths)))) as pool:
+        prepared = list(pool.map(prepare, file_paths))
+    entries = [entry for entry, _ in prepared]
+    callback_json = {"files": entries}
+
+    queued = [job for entry, job in prepared if entry["status"] == "queued"]
+    if queued:
+        # One job for the whole set, so the callback still fires once, after the last file
+        with metrics.stage("queue"):
+            enqueue("upload_batch", {
+                "backend": backend.to_params(), "jobs": queued, "source": source,
+                "callback_url": callback_url, "callback_mode": callback_mode, "callback_json": callback_json,
+                "metrics": metrics.enabled,
+            })
+    else:
+        with metrics.stage("callback"):
+            send_callback(callback_url, callback_json, callback_mode, source=source)
+
+    failed = []
+    for entry in entries:
+        name = os.path.basename(entry["local_path"])
+        if entry["status"] == "error":
+            print(f"[{source}] Failed {name}: {entry['error']}")
+            failed.append(f"{name}: {entry['error']}")
+        else:
+            print(f"[{source}] {entry['status'].capitalize()} {name} -> {entry['url']}")
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(entries)} file(s) failed to upload: " + "; ".join(failed))
+    return {entry["local_path"]: entry["url"] for entry in entries}
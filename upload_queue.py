@@ -0,0 +1,261 @@
+# upload_queue.py
+"""
+Background upload queue backed by a durable spool directory.
+
+With `async_upload` the cloud nodes spool the encoded bytes (or a reference to
+the local file) plus a small JSON job, return the deterministic URL right away
+and let worker threads do the transfer and callback, retrying with exponential
+backoff. Jobs live on disk until they succeed, so pending uploads are picked up
+again after a restart; jobs that keep failing are moved to `failed/`.
+
+Env:
+  JLNODES_SPOOL_DIR           spool location (default <state dir>/spool)
+  JLNODES_QUEUE_WORKERS       worker threads (default 2)
+  JLNODES_QUEUE_MAX_ATTEMPTS  attempts before a job is moved to failed/ (default 5)
+"""
+import collections
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+from .upload_journal import STATE_DIR
+
+SPOOL_DIR = os.getenv("JLNODES_SPOOL_DIR", os.path.join(STATE_DIR, "spool"))
+PENDING_DIR = os.path.join(SPOOL_DIR, "pending")
+FAILED_DIR = os.path.join(SPOOL_DIR, "failed")
+WORKERS = int(os.getenv("JLNODES_QUEUE_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("JLNODES_QUEUE_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+
+_handlers = {}  # kind -> fn(params, payload_path)
+_queue = queue.Queue()
+_lock = threading.Lock()
+_workers = []
+_active = set()  # job ids queued, in flight or waiting for a retry
+_stats = {"completed": 0, "failed": 0, "retries": 0, "in_flight": 0}
+_recent_errors = collections.deque(maxlen=20)
+
+
+# ---------- spool files ----------
+
+def _job_path(directory, job_id):
+    return os.path.join(directory, f"{job_id}.json")
+
+
+def _write_private(path, data):
+    # Jobs may carry credentials from node fields: keep them owner-only.
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _write_job(directory, job):
+    _write_private(_job_path(directory, job["id"]), json.dumps(job).encode("utf-8"))
+
+
+def _read_job(job_id):
+    with open(_job_path(PENDING_DIR, job_id), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _pending_ids():
+    try:
+        return sorted(
+            (entry.stat().st_mtime, entry.name[:-5])
+            for entry in os.scandir(PENDING_DIR)
+            if entry.name.endswith(".json")
+        )
+    except FileNotFoundError:
+        return []
+
+
+# ---------- public API ----------
+
+def register_handler(kind, fn):
+    """Register the function that performs jobs of `kind` and resume its spooled jobs."""
+    with _lock:
+        _handlers[kind] = fn
+    for _, job_id in _pending_ids():
+        try:
+            job = _read_job(job_id)
+        except (OSError, ValueError):
+            continue
+        if job.get("kind") == kind:
+            _submit(job_id)
+
+
+def enqueue(kind, params, data=None):
+    """
+    Spool a job and return its id. `data` (bytes) is written next to the job;
+    jobs that reference a local file pass its path in `params` instead.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No upload handler registered for '{kind}'")
+
+    os.makedirs(PENDING_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    payload = None
+    if data is not None:
+        payload = f"{job_id}.bin"
+        _write_private(os.path.join(PENDING_DIR, payload), data)
+
+    # The job file is written last: a payload without a job is never picked up.
+    _write_job(PENDING_DIR, {
+        "id": job_id,
+        "kind": kind,
+        "params": params,
+        "payload": payload,
+        "attempts": 0,
+        "created": time.time(),
+        "last_error": None,
+    })
+    _submit(job_id)
+    return job_id
+
+
+def queue_status():
+    """Queue depth, in-flight and failure counters, and the most recent errors."""
+    try:
+        failed_files = sum(1 for name in os.listdir(FAILED_DIR) if name.endswith(".json"))
+    except FileNotFoundError:
+        failed_files = 0
+    with _lock:
+        status = dict(_stats)
+        status["pending"] = len(_active)
+        status["workers"] = len(_workers)
+        status["recent_errors"] = list(_recent_errors)
+    status["spooled"] = len(_pending_ids())
+    status["failed_spooled"] = failed_files
+    return status
+
+
+def retry_failed():
+    """Move every job in failed/ back to pending with a fresh attempt count."""
+    try:
+        names = [name for name in os.listdir(FAILED_DIR) if name.endswith(".json")]
+    except FileNotFoundError:
+        return 0
+    os.makedirs(PENDING_DIR, exist_ok=True)
+    for name in names:
+        with open(os.path.join(FAILED_DIR, name), "r", encoding="utf-8") as f:
+            job = json.load(f)
+        if job.get("payload"):
+            os.replace(os.path.join(FAILED_DIR, job["payload"]), os.path.join(PENDING_DIR, job["payload"]))
+        job["attempts"] = 0
+        _write_job(PENDING_DIR, job)
+        _remove(os.path.join(FAILED_DIR, name))
+        if job.get("kind") in _handlers:
+            _submit(job["id"])
+    return len(names)
+
+
+def wait_until_idle(timeout=None):
+    """Block until no job is queued, running or waiting for a retry. Returns True if idle."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        with _lock:
+            if not _active:
+                return True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+
+
+# ---------- workers ----------
+
+def _submit(job_id):
+    with _lock:
+        if job_id in _active:
+            return
+        _active.add(job_id)
+        while len(_workers) < max(1, WORKERS):
+            t = threading.Thread(target=_worker, name=f"jlnodes-upload-{len(_workers)}", daemon=True)
+            t.start()
+            _workers.append(t)
+    _queue.put(job_id)
+
+
+def _worker():
+    while True:
+        job_id = _queue.get()
+        try:
+            _run(job_id)
+        except Exception as e:
+            print(f"[upload_queue] Job {job_id} crashed: {e}")
+            with _lock:
+                _active.discard(job_id)
+        finally:
+            _queue.task_done()
+
+
+def _run(job_id):
+    try:
+        job = _read_job(job_id)
+    except FileNotFoundError:
+        with _lock:
+            _active.discard(job_id)
+        return
+
+    payload_path = os.path.join(PENDING_DIR, job["payload"]) if job.get("payload") else None
+    with _lock:
+        handler = _handlers[job["kind"]]
+        _stats["in_flight"] += 1
+    try:
+        handler(job["params"], payload_path)
+    except Exception as e:
+        _fail(job, payload_path, e)
+        return
+    finally:
+        with _lock:
+            _stats["in_flight"] -= 1
+
+    _remove(_job_path(PENDING_DIR, job_id))
+    if payload_path:
+        _remove(payload_path)
+    with _lock:
+        _stats["completed"] += 1
+        _active.discard(job_id)
+
+
+def _fail(job, payload_path, error):
+    job["attempts"] += 1
+    job["last_error"] = str(error)
+    with _lock:
+        _recent_errors.append({"id": job["id"], "kind": job["kind"], "attempt": job["attempts"], "error": str(error)})
+
+    if job["attempts"] >= MAX_ATTEMPTS:
+        os.makedirs(FAILED_DIR, exist_ok=True)
+        if payload_path:
+            os.replace(payload_path, os.path.join(FAILED_DIR, job["payload"]))
+        _write_job(FAILED_DIR, job)
+        _remove(_job_path(PENDING_DIR, job["id"]))
+        print(f"[upload_queue] Job {job['id']} ({job['kind']}) failed permanently: {error}")
+        with _lock:
+            _stats["failed"] += 1
+            _active.discard(job["id"])
+        return
+
+    _write_job(PENDING_DIR, job)
+    delay = min(BACKOFF_MAX, BACKOFF_BASE ** job["attempts"]) * random.uniform(0.5, 1.5)
+    print(f"[upload_queue] Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, retrying in {delay:.1f}s: {error}")
+    with _lock:
+        _stats["retries"] += 1
+    timer = threading.Timer(delay, _queue.put, (job["id"],))
+    timer.daemon = True
+    timer.start()
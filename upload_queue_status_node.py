@@ -0,0 +1,59 @@
+# upload_queue_status_node.py
+import json
+
+from . import upload_queue
+from .cloud_clients import clear_clients, client_cache_stats
+from .upload_limits import limits_status
+
+
+class UploadQueueStatusNode:
+    """
+    Report the state of the background upload queue (async_upload mode of the cloud nodes):
+    queue depth, in-flight jobs, retries, permanent failures and the latest errors,
+    plus the process-wide transfer/bandwidth limits (upload_limits.py) and the
+    pooled S3/Azure clients' hit / miss / eviction counters (cloud_clients.py).
+    Set `retry_failed` to move failed jobs back into the queue, `reset_clients`
+    to drop the pooled clients (e.g. after rotating credentials).
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {},
+            "optional": {
+                "retry_failed": ("BOOLEAN", {"default": False}),
+                "reset_clients": ("BOOLEAN", {"default": False}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT", "INT")
+    RETURN_NAMES = ("status", "pending", "failed")
+    FUNCTION = "status"
+    OUTPUT_NODE = True
+    CATEGORY = "JLNodes/cloud"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Always re-run: the queue changes between prompts
+        return float("nan")
+
+    def status(self, retry_failed=False, reset_clients=False):
+        if retry_failed:
+            moved = upload_queue.retry_failed()
+            print(f"[UploadQueueStatusNode] Re-queued {moved} failed job(s)")
+        if reset_clients:
+            clear_clients()
+            print("[UploadQueueStatusNode] Dropped the pooled storage clients")
+
+        status = upload_queue.queue_status()
+        status["limits"] = limits_status()
+        status["clients"] = client_cache_stats()
+        text = json.dumps(status, indent=2)
+        return {
+            "ui": {"text": [text]},
+            "result": (text, status["pending"], status["failed_spooled"]),
+        }
+
+
+NODE_CLASS_MAPPINGS = {"UploadQueueStatusNode": UploadQueueStatusNode}
+NODE_DISPLAY_NAME_MAPPINGS = {"UploadQueueStatusNode": "Upload Queue Status"}